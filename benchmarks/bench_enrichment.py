@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Benchmark hors ligne de l'enrichissement des bookmarks (enrichment.py).
+
+Démarre un serveur HTTP local qui sert des pages HTML statiques (avec une
+latence configurable), puis enrichit une liste d'URLs dont une part est
+répétée. Affiche le débit (URLs/s), les pages réellement téléchargées, les
+réponses servies par le cache et un exemple de métadonnées extraites, puis
+vérifie que le titre et la description de chaque page ont été extraits et
+que la règle du domaine a désactivé l'archivage (code de sortie 1 sinon).
+Les pages ont un long <head>, envoyé en plusieurs morceaux, avant les
+balises de métadonnées.
+
+    python benchmarks/bench_enrichment.py --urls 2000 --pages 500 --latency 0.1 --concurrency 8
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAD_PADDING = "<style>" + ".bloc { marge: 0; }\n" * 8000 + "</style>\n"
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<meta charset="utf-8">
+{padding}
+<title>Article {n} - Blog de test</title>
+<meta property="og:title" content="Article {n}">
+<meta name="description" content="Résumé de l'article {n}, servi par le serveur de test.">
+</head><body>{body}</body></html>
+"""
+
+
+async def start_static_server(pages, latency):
+    """Sert `pages` pages HTML sur /articles/<n> et retourne (runner, URL de base)."""
+    body = "<p>" + "Lorem ipsum dolor sit amet. " * 200 + "</p>"
+
+    async def handle_article(request):
+        n = int(request.match_info['n'])
+        if n >= pages:
+            raise web.HTTPNotFound()
+        await asyncio.sleep(latency)
+        # Envoi en plusieurs morceaux, comme une page servie au fil de l'eau
+        page = PAGE.format(n=n, body=body, padding=HEAD_PADDING).encode()
+        response = web.StreamResponse(headers={'Content-Type': 'text/html; charset=utf-8'})
+        await response.prepare(request)
+        try:
+            for start in range(0, len(page), 16 * 1024):
+                await response.write(page[start:start + 16 * 1024])
+                await asyncio.sleep(0)
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # Le client a fermé la connexion après avoir lu ce qu'il lui fallait
+        return response
+
+    app = web.Application()
+    app.router.add_get('/articles/{n}', handle_article)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def run_benchmark(args):
+    runner, base_url = await start_static_server(args.pages, args.latency)
+    os.environ['ENRICH_CONCURRENCY'] = str(args.concurrency)
+
+    from enrichment import PageEnricher, PAGE_FETCHES
+    rng = random.Random(args.seed)
+    urls = [f"{base_url}/articles/{rng.randrange(args.pages)}?utm_source=discord" for _ in range(args.urls)]
+    enricher = PageEnricher(rules={'127.0.0.1': {'tags': ['test'], 'archive': False}})
+
+    started = time.perf_counter()
+    async with enricher:
+        results = await asyncio.gather(*(enricher.enrich(url) for url in urls))
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+
+    print(f"{args.urls} URLs vers {args.pages} pages, {args.concurrency} téléchargements simultanés")
+    print(f"Durée:     {elapsed:.2f}s")
+    print(f"Débit:     {args.urls / elapsed:.1f} URLs/s")
+    print(f"Pages:     {PAGE_FETCHES.snapshot()}")
+    print(f"Exemple:   {json.dumps(results[0], ensure_ascii=False)}")
+
+    # Vérifier les métadonnées extraites et la règle du domaine
+    errors = []
+    for url, result in zip(urls, results):
+        n = url.split('/articles/')[1].split('?')[0]
+        if result['title'] != f"Article {n}":
+            errors.append(f"{url}: titre {result['title']!r}")
+        elif result['description'] != f"Résumé de l'article {n}, servi par le serveur de test.":
+            errors.append(f"{url}: description {result['description']!r}")
+        elif result['archive'] is not False or 'test' not in result['tags']:
+            errors.append(f"{url}: règle non appliquée ({result['archive']}, {result['tags']})")
+    if errors:
+        print(f"Vérification: {len(errors)} URLs incorrectes, par exemple {errors[0]}")
+        sys.exit(1)
+    print(f"Vérification: titre, description et règle d'archivage corrects pour les {len(urls)} URLs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne de l'enrichissement des bookmarks")
+    parser.add_argument("-n", "--urls", type=int, default=1000, help="Nombre d'URLs à enrichir (défaut: 1000)")
+    parser.add_argument("--pages", type=int, default=300, help="Nombre de pages distinctes (défaut: 300)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Téléchargements simultanés maximum (défaut: 4)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence du serveur en secondes (défaut: 0.05)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire (défaut: 42)")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
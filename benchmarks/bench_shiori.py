@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Benchmark hors ligne de ShioriService et du pipeline d'importation.
+
+Démarre un faux serveur Shiori en mémoire (voir fake_shiori.py), puis envoie
+des bookmarks soit directement via ShioriService (`--mode service`), soit à
+travers le pipeline d'import_history alimenté par un historique Discord
+synthétique (`--mode pipeline`). Affiche le débit (bookmarks/s), les
+latences p50/p99 de save_bookmark et le pic de mémoire. Avec
+`--lock-concurrency`, vérifie aussi que la limite adaptative se stabilise
+à ce nombre ou en dessous (code de sortie 1 sinon).
+
+    python benchmarks/bench_shiori.py --mode pipeline --messages 5000 --latency 0.1 --lock-concurrency 4
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord.utils import time_snowflake
+from fake_shiori import FakeShiori
+
+
+class FakeMessage:
+    """Message Discord minimal pour scan_history."""
+
+    def __init__(self, message_id, content, created_at):
+        self.id = message_id
+        self.content = content
+        self.author = 'utilisateur'
+        self.embeds = []
+        self.created_at = created_at
+
+
+class FakeChannel:
+    """Canal Discord synthétique exposant la même méthode history() que discord.py."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def history(self, limit=None, after=None, before=None, oldest_first=None):
+        # Comme discord.py: bornes exclusives (objet avec un id ou date), ordre
+        # chronologique par défaut seulement si `after` est donné
+        if oldest_first is None:
+            oldest_first = after is not None
+        low = _snowflake(after) if after is not None else 0
+        high = _snowflake(before) if before is not None else float('inf')
+        messages = [message for message in self.messages if low < message.id < high]
+        if not oldest_first:
+            messages.reverse()
+        for message in messages[:limit]:
+            yield message
+
+
+def _snowflake(value):
+    """Id Discord d'une borne de history(): objet avec un id ou date."""
+    return time_snowflake(value) if isinstance(value, datetime) else value.id
+
+
+def build_history(count, url_ratio=0.5, duplicate_ratio=0.0, seed=42):
+    """Génère `count` messages dont une part `url_ratio` contient une URL."""
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    messages = []
+    for n in range(count):
+        content = f"message {n} sans lien"
+        if rng.random() < url_ratio:
+            article = rng.randrange(n + 1) if rng.random() < duplicate_ratio else n
+            content = f"à lire: https://example.com/articles/{article}?utm_source=discord"
+        created_at = start + timedelta(minutes=n)
+        # Ids réalistes (snowflakes) pour que les bornes after/before fonctionnent comme sur Discord
+        messages.append(FakeMessage(time_snowflake(created_at), content, created_at))
+    return messages
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_benchmark(args):
+    fake = FakeShiori(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      auth_failure_rate=args.auth_failure_rate, lock_rate=args.lock_rate,
+                      lock_concurrency=args.lock_concurrency, seed=args.seed)
+    base_url = await fake.start()
+    os.environ.update({
+        'SHIORI_API_URL': f"{base_url}/api/v1",
+        'SHIORI_USERNAME': 'bench',
+        'SHIORI_PASSWORD': 'bench',
+        'SHIORI_DEDUP_FILE': '',   # Index des doublons en mémoire uniquement
+        'SHIORI_TOKEN_FILE': '',   # Pas de token conservé entre deux benchmarks
+    })
+
+    from shiori_service import ShioriService
+    from import_history import scan_history, run_import_pipeline
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    for name in ('discord-shiori-bot', 'import-history'):
+        logging.getLogger(name).setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    service = ShioriService()
+    service.retry_delay = args.retry_delay
+
+    # Mesurer la latence de chaque enregistrement (save_bookmark passe par create_bookmark)
+    latencies = []
+    create_bookmark = service.create_bookmark
+
+    async def timed_create_bookmark(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await create_bookmark(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    service.create_bookmark = timed_create_bookmark
+
+    # Relever la limite adaptative pendant l'exécution
+    limits = []
+
+    async def sample_limit():
+        while True:
+            limits.append(service.limiter.current_limit)
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_limit())
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with service:
+        if args.mode == 'service':
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def send(n):
+                async with semaphore:
+                    return await service.save_bookmark(f"https://example.com/articles/{n}", f"bookmark {n}")
+
+            results = await asyncio.gather(*(send(n) for n in range(args.messages)))
+            success, fail = results.count(True), results.count(False)
+        else:
+            channel = FakeChannel(build_history(args.messages, args.url_ratio, args.duplicate_ratio, args.seed))
+            records = scan_history(channel, None, oldest_first=True)
+            success, fail = await run_import_pipeline(service, records, concurrency=args.concurrency, rate=args.rate)
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await fake.close()
+
+    print(f"Mode: {args.mode}, {args.messages} {'bookmarks' if args.mode == 'service' else 'messages'}, "
+          f"concurrence max {args.concurrency}")
+    print(f"Durée:            {elapsed:.2f}s")
+    print(f"Succès / échecs:  {success} / {fail}")
+    print(f"Créés par Shiori: {fake.stats['created']}")
+    print(f"Débit:            {fake.stats['created'] / elapsed:.1f} bookmarks/s")
+    print(f"Latence p50/p99:  {percentile(latencies, 0.5) * 1000:.0f} ms / {percentile(latencies, 0.99) * 1000:.0f} ms")
+    # Seconde moitié de l'exécution: la limite a eu le temps de converger
+    settled = percentile(limits[len(limits) // 2:], 0.5)
+    print(f"Limite adaptative: médiane {settled} (seconde moitié), finale {service.limiter.current_limit}")
+    print(f"Serveur:          {fake.stats}")
+    print(f"Mémoire:          pic Python {peak / 1024 / 1024:.1f} Mio, "
+          f"RSS max {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} Mio")
+
+    if args.lock_concurrency is not None and settled > args.lock_concurrency:
+        print(f"Vérification: la limite adaptative reste au-dessus de --lock-concurrency {args.lock_concurrency}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne de ShioriService et de l'import")
+    parser.add_argument("--mode", choices=("service", "pipeline"), default="pipeline",
+                        help="service: appels directs à save_bookmark, pipeline: import d'un historique synthétique")
+    parser.add_argument("-n", "--messages", type=int, default=2000, help="Nombre de bookmarks (service) ou de messages (pipeline)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Nombre de requêtes simultanées maximum (défaut: 8)")
+    parser.add_argument("--rate", type=float, default=0, help="Débit maximum en requêtes/s du pipeline, 0 = illimité")
+    parser.add_argument("--url-ratio", type=float, default=0.5, help="Part des messages contenant une URL (défaut: 0.5)")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0, help="Part des URLs déjà postées (défaut: 0)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence moyenne du faux Shiori en secondes (défaut: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Écart type de la latence en secondes (défaut: 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilité d'une erreur 500 (défaut: 0)")
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0, help="Probabilité d'un 401 par expiration du token (défaut: 0)")
+    parser.add_argument("--lock-rate", type=float, default=0.0, help="Probabilité d'une erreur « database is locked » (défaut: 0)")
+    parser.add_argument("--lock-concurrency", type=int, help="Nombre d'enregistrements simultanés au-delà duquel la base est verrouillée")
+    parser.add_argument("--retry-delay", type=float, default=0.1, help="Délai entre deux tentatives de ShioriService (défaut: 0.1)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire (défaut: 42)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Afficher les logs du service")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Micro-benchmark de l'extraction d'URLs sur un corpus synthétique de messages.
+
+Compare l'ancienne expression régulière (recompilée via re.findall à chaque
+message) au module url_extractor, en messages par seconde.
+
+    python benchmarks/bench_url_extractor.py --messages 200000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from url_extractor import extract_urls
+
+WORDS = ["salut", "regardez", "ce", "lien", "super", "article", "sur", "le", "sujet", "merci",
+         "vidéo", "à", "lire", "plus", "tard", "intéressant", "pour", "le", "projet"]
+URL_FORMS = [
+    "https://example.com/articles/{n}",
+    "<https://example.org/page/{n}>",
+    "[doc](https://docs.example.net/guide/{n}?utm_source=discord)",
+    "**https://blog.example.io/post-{n}**",
+    "https://fr.wikipedia.org/wiki/Page_({n})",
+    "(voir https://news.example.com/{n}).",
+    "||https://spoiler.example.com/{n}||",
+]
+
+
+def build_corpus(count, seed=42):
+    """Génère `count` messages dont environ un tiers contient une ou plusieurs URLs."""
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 30))
+        if rng.random() < 0.33:
+            for _ in range(rng.randint(1, 3)):
+                words.insert(rng.randint(0, len(words)), rng.choice(URL_FORMS).format(n=n))
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def legacy_extract(text):
+    return re.findall(r'(https?://[^\s]+)', text)
+
+
+def run(name, func, corpus):
+    started = time.perf_counter()
+    found = 0
+    for text in corpus:
+        found += len(func(text))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<15} {len(corpus) / elapsed:>12,.0f} messages/s  ({found} URLs, {elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'extraction d'URLs")
+    parser.add_argument("-n", "--messages", type=int, default=200000, help="Nombre de messages du corpus (défaut: 200000)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire (défaut: 42)")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.seed)
+    print(f"Corpus: {len(corpus)} messages")
+    run("regex initiale", legacy_extract, corpus)
+    run("url_extractor", extract_urls, corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Faux serveur Shiori en mémoire (aiohttp) pour les benchmarks hors ligne.
+
+Simule les endpoints utilisés par ShioriService:
+- POST /api/v1/auth/login
+- POST /api/bookmarks
+- GET  /api/bookmarks?page=N
+- PUT  /api/cache (archivage d'un lot de bookmarks)
+
+avec une latence, un taux d'erreurs 5xx, des 401 (token expiré) et des
+erreurs « database is locked » configurables.
+"""
+import time
+import random
+import asyncio
+import itertools
+
+from aiohttp import web
+
+
+class FakeShiori:
+    """Faux serveur Shiori.
+
+    - `latency` / `jitter`: durée de traitement d'un enregistrement (secondes)
+    - `error_rate`: probabilité d'une erreur 500 générique
+    - `auth_failure_rate`: probabilité que le token soit invalidé (401)
+    - `lock_rate`: probabilité d'une erreur 500 « database is locked »
+    - `lock_concurrency`: au-delà de ce nombre d'enregistrements simultanés,
+      toute requête échoue avec « database is locked » (comme SQLite sous charge)
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, auth_failure_rate=0.0,
+                 lock_rate=0.0, lock_concurrency=None, token_ttl=3600, page_size=30, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.auth_failure_rate = auth_failure_rate
+        self.lock_rate = lock_rate
+        self.lock_concurrency = lock_concurrency
+        self.token_ttl = token_ttl
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.token_ids = itertools.count(1)
+        self.valid_tokens = set()
+        self.bookmarks = []
+        self.in_flight = 0
+        self.stats = {'logins': 0, 'created': 0, 'archived': 0, '401': 0, '500': 0, 'locked': 0}
+        self.runner = None
+        self.base_url = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Démarre le serveur et retourne son URL de base."""
+        app = web.Application()
+        app.router.add_post('/api/v1/auth/login', self.handle_login)
+        app.router.add_post('/api/bookmarks', self.handle_create)
+        app.router.add_get('/api/bookmarks', self.handle_list)
+        app.router.add_put('/api/cache', self.handle_cache)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        host, port = self.runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def _authorized(self, request):
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        return token in self.valid_tokens
+
+    async def handle_login(self, request):
+        self.stats['logins'] += 1
+        token = f"fake-token-{next(self.token_ids)}"
+        self.valid_tokens.add(token)
+        return web.json_response({
+            'ok': True,
+            'message': {'token': token, 'expires': int(time.time() + self.token_ttl)}
+        })
+
+    async def handle_create(self, request):
+        if not self._authorized(request):
+            self.stats['401'] += 1
+            return web.json_response({'message': 'unauthorized'}, status=401)
+        if self.random.random() < self.auth_failure_rate:
+            # Invalider le token pour simuler une expiration côté serveur
+            self.valid_tokens.clear()
+            self.stats['401'] += 1
+            return web.json_response({'message': 'token expired'}, status=401)
+
+        self.in_flight += 1
+        try:
+            locked = self.lock_concurrency is not None and self.in_flight > self.lock_concurrency
+            await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+            if locked or self.random.random() < self.lock_rate:
+                self.stats['locked'] += 1
+                return web.Response(text='database is locked (SQLITE_BUSY)', status=500)
+            if self.random.random() < self.error_rate:
+                self.stats['500'] += 1
+                return web.Response(text='internal server error', status=500)
+
+            data = await request.json()
+            bookmark = {'id': len(self.bookmarks) + 1, 'url': data.get('url'), 'excerpt': data.get('excerpt', '')}
+            self.bookmarks.append(bookmark)
+            self.stats['created'] += 1
+            return web.json_response(bookmark)
+        finally:
+            self.in_flight -= 1
+
+    async def handle_cache(self, request):
+        if not self._authorized(request):
+            self.stats['401'] += 1
+            return web.json_response({'message': 'unauthorized'}, status=401)
+        data = await request.json()
+        ids = data.get('ids', [])
+        # L'archivage coûte environ une latence d'enregistrement par page
+        await asyncio.sleep(self.latency * len(ids))
+        self.stats['archived'] += len(ids)
+        return web.json_response([bookmark for bookmark in self.bookmarks if bookmark['id'] in ids])
+
+    async def handle_list(self, request):
+        if not self._authorized(request):
+            self.stats['401'] += 1
+            return web.json_response({'message': 'unauthorized'}, status=401)
+        page = max(1, int(request.query.get('page', 1)))
+        start = (page - 1) * self.page_size
+        max_page = max(1, -(-len(self.bookmarks) // self.page_size))
+        return web.json_response({
+            'bookmarks': self.bookmarks[start:start + self.page_size],
+            'page': page,
+            'maxPage': max_page
+        })
@@ -1,83 +1,307 @@
 import os
-import re
+import time
+import signal
+import asyncio
 import logging
 import discord
+from collections import OrderedDict
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
-from shiori_service import ShioriService
+from routing import load_routes
+from ingestion import IngestionQueue
+from outbox import Outbox, OutboxReplayer
+from enrichment import enricher_from_env
+from url_extractor import extract_message_urls
+from metrics import REGISTRY, URLS_PER_MESSAGE, Gauge, start_metrics_server, log_snapshots
+from log_config import Redacted, setup_logging
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger('discord-shiori-bot')
+# Instant de démarrage, pour mesurer le temps de connexion
+STARTED_AT = time.monotonic()
 
 # Charger les variables d'environnement
 load_dotenv()
 
+# Configuration du logging (écriture en arrière-plan, niveaux par sous-système via LOG_LEVELS)
+setup_logging()
+logger = logging.getLogger('discord-shiori-bot')
+
 # Configuration
 TOKEN = os.getenv('DISCORD_TOKEN')
 CHANNEL_ID = int(os.getenv('DISCORD_CHANNEL_ID', 0))  # Par défaut 0 si non défini
+CHANNELS_CONFIG = os.getenv('CHANNELS_CONFIG')  # Fichier JSON canal -> cible Shiori (remplace DISCORD_CHANNEL_ID)
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))  # Workers qui envoient les URLs à Shiori
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 1000))  # Capacité de la file d'ingestion
+INGEST_DRAIN_TIMEOUT = float(os.getenv('INGEST_DRAIN_TIMEOUT', 8))  # Délai de vidage à l'arrêt (secondes)
+OUTBOX_FILE = os.getenv('OUTBOX_FILE', 'outbox.db')  # Boîte d'envoi persistante des URLs
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))  # Entrées rejouées par lot
+OUTBOX_REPLAY_RATE = float(os.getenv('OUTBOX_REPLAY_RATE', 1))  # Entrées rejouées par seconde
+OUTBOX_REPLAY_INTERVAL = float(os.getenv('OUTBOX_REPLAY_INTERVAL', 30))  # Intervalle de rejeu (secondes)
+OUTBOX_BASE_DELAY = float(os.getenv('OUTBOX_BASE_DELAY', 30))  # Délai avant la 1re nouvelle tentative (secondes)
+OUTBOX_MAX_DELAY = float(os.getenv('OUTBOX_MAX_DELAY', 3600))  # Délai maximum entre deux tentatives (secondes)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # Port du serveur /metrics (0 = désactivé)
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', 0))  # Intervalle des instantanés JSON dans les logs (0 = désactivé)
+LEAN_MODE = os.getenv('LEAN_MODE', '0') == '1'  # Mode économe: intentions et caches Discord réduits au strict nécessaire
+MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', 0))  # Messages gardés en cache en mode économe (0 = aucun)
+CATCHUP_LIMIT = int(os.getenv('CATCHUP_LIMIT', 5000))  # Messages manqués rattrapés au plus par canal à la reconnexion (0 = désactivé)
+
+if LEAN_MODE:
+    # Seuls les messages des serveurs sont reçus (pas de messages privés, réactions, présences,
+    # saisie, vocal...); l'intention `guilds` reste nécessaire pour connaître les canaux
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.message_content = True  # Nécessaire pour lire le contenu des messages
+    # Sans cache des membres ni chargement des membres de chaque serveur au démarrage
+    client = discord.Client(intents=intents, max_messages=MESSAGE_CACHE_SIZE or None,
+                            member_cache_flags=discord.MemberCacheFlags.none(),
+                            chunk_guilds_at_startup=False)
+else:
+    # Configurer les intentions Discord
+    intents = discord.Intents.default()
+    intents.message_content = True  # Nécessaire pour lire le contenu des messages
+    
+    # Initialiser le client Discord
+    client = discord.Client(intents=intents)
+# Table de routage canal -> cible Shiori (un client par cible)
+routes, shiori_services = load_routes(CHANNELS_CONFIG, CHANNEL_ID)
+# Enrichissement optionnel des bookmarks, partagé par toutes les cibles
+enricher = enricher_from_env()
+for service in shiori_services:
+    service.enricher = enricher
+
+outbox = Outbox(OUTBOX_FILE, base_delay=OUTBOX_BASE_DELAY, max_delay=OUTBOX_MAX_DELAY)
+
+async def deliver_url(item):
+    """Envoie une URL de la file d'ingestion vers Shiori.
+
+    L'entrée correspondante n'est supprimée de l'outbox qu'en cas de succès;
+    sinon une nouvelle tentative est planifiée.
+    """
+    # Les entrées antérieures au routage multi-canaux n'ont pas de canal: cible par défaut
+    route = routes.get(item.get('channel_id') or CHANNEL_ID)
+    if route is None:
+        logger.warning("Aucune cible Shiori pour le canal %s, URL conservée dans l'outbox: %s",
+                       item.get('channel_id'), item['url'])
+        outbox.reschedule(item['id'])
+        return False
+    
+    try:
+        result = await route['service'].save_bookmark(item['url'], item['description'], route['tags'])
+    except Exception:
+        outbox.reschedule(item['id'])
+        raise
+    
+    if result:
+        outbox.delete(item['id'])
+    else:
+        logger.warning("L'URL n'a pas pu être enregistrée dans Shiori, elle reste dans l'outbox: %s", item['url'])
+        outbox.reschedule(item['id'])
+    return result
+
+ingestion_queue = IngestionQueue(deliver_url, workers=INGEST_WORKERS, maxsize=INGEST_QUEUE_SIZE)
+outbox_replayer = OutboxReplayer(outbox, ingestion_queue.put, batch_size=OUTBOX_BATCH_SIZE,
+                                 rate=OUTBOX_REPLAY_RATE, interval=OUTBOX_REPLAY_INTERVAL)
+
+# Jauges lues à chaque export des métriques
+REGISTRY.register(Gauge('ingestion_queue_depth', "URLs en attente dans la file d'ingestion", ingestion_queue.depth))
+REGISTRY.register(Gauge('ingestion_queue_full_waits_total', "Mises en file bloquées par une file pleine",
+                        lambda: ingestion_queue.stats['full_waits']))
+REGISTRY.register(Gauge('outbox_pending', "Entrées en attente dans l'outbox", lambda: len(outbox)))
+REGISTRY.register(Gauge('shiori_adaptive_limit', "Limite adaptative de requêtes simultanées vers Shiori (toutes cibles)",
+                        lambda: sum(service.limiter.current_limit for service in shiori_services)))
+REGISTRY.register(Gauge('shiori_in_flight', "Requêtes d'enregistrement en cours vers Shiori (toutes cibles)",
+                        lambda: sum(service.limiter.in_flight for service in shiori_services)))
+
+def resident_memory_mb():
+    """Mémoire résidente maximale du processus en Mio (None si non disponible)."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Non disponible sous Windows
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Ids des derniers messages traités, pour ne pas traiter deux fois un message reçu
+# à la fois en direct et pendant le rattrapage
+recent_message_ids = OrderedDict()
+RECENT_MESSAGE_IDS_SIZE = 1000
+# Canaux en cours de rattrapage et position atteinte en direct pendant ce rattrapage
+catching_up = set()
+deferred_positions = {}
+catch_up_task = None
+
+async def handle_message(message, live=True):
+    """Met en file les URLs d'un message d'un canal surveillé et enregistre la position."""
+    # Vérifier si le message est dans un canal surveillé (recherche O(1)), avant tout autre traitement
+    channel_id = message.channel.id
+    if channel_id not in routes:
+        return
+    
+    # Ignorer les messages du bot lui-même
+    if message.author == client.user:
+        return
+    
+    if message.id in recent_message_ids:
+        return
+    recent_message_ids[message.id] = None
+    if len(recent_message_ids) > RECENT_MESSAGE_IDS_SIZE:
+        recent_message_ids.popitem(last=False)
+
+    # Contenu tronqué (LOG_CONTENT_LENGTH), formaté seulement si le niveau DEBUG est actif
+    logger.debug("Message dans le canal surveillé: '%s'", Redacted(message.content),
+                 extra={'channel_id': channel_id, 'message_id': message.id})
+
+    # Extraire les URLs du message (contenu et embeds, sans doublons)
+    urls = extract_message_urls(message)
+    URLS_PER_MESSAGE.observe(len(urls))
+
+    if urls:
+        logger.info("%d URLs trouvées dans le message %s", len(urls), message.id,
+                    extra={'channel_id': channel_id, 'message_id': message.id})
+        for url in urls:
+            logger.debug("URL détectée: %s", url)
+            # L'URL est d'abord écrite dans l'outbox, puis envoyée en arrière-plan par les workers
+            entry_id = outbox.add(url, message.content, channel_id)
+            await ingestion_queue.put({'id': entry_id, 'url': url, 'description': message.content,
+                                       'channel_id': channel_id})
+        logger.debug("File d'ingestion: %s URLs en attente", ingestion_queue.depth())
+    else:
+        logger.debug("Aucune URL trouvée dans le message")
+    
+    # Les URLs sont dans l'outbox: le message est traité. Pendant un rattrapage, la position
+    # n'avance pas avec les messages reçus en direct, pour ne pas sauter les messages manqués
+    # si le bot s'arrête avant la fin du rattrapage.
+    if live and channel_id in catching_up:
+        deferred_positions[channel_id] = max(deferred_positions.get(channel_id, 0), message.id)
+    else:
+        outbox.set_last_message_id(channel_id, message.id)
+
+async def catch_up():
+    """Rattrape les messages postés dans les canaux surveillés pendant une interruption.
 
-# Configurer les intentions Discord
-intents = discord.Intents.default()
-intents.message_content = True  # Nécessaire pour lire le contenu des messages
+    Seuls les messages postérieurs au dernier message traité sont demandés à
+    Discord; ils suivent le même chemin que les messages reçus en direct.
+    """
+    for channel_id in routes:
+        last_message_id = outbox.last_message_id(channel_id)
+        channel = client.get_channel(channel_id)
+        if last_message_id is None or channel is None:
+            continue
+        
+        catching_up.add(channel_id)
+        count = 0
+        try:
+            async for message in channel.history(limit=CATCHUP_LIMIT, after=discord.Object(id=last_message_id),
+                                                 oldest_first=True):
+                await handle_message(message, live=False)
+                count += 1
+            if count:
+                logger.info("Rattrapage de #%s: %s messages postés pendant l'interruption", channel.name, count)
+            if count >= CATCHUP_LIMIT:
+                logger.warning("Rattrapage de #%s limité à %s messages: "
+                               "utilisez import_history.py pour les messages plus anciens", channel.name, CATCHUP_LIMIT)
+        except Exception as e:
+            logger.error("Erreur lors du rattrapage de #%s: %s", channel.name, e, exc_info=True)
+        finally:
+            catching_up.discard(channel_id)
+            if channel_id in deferred_positions:
+                outbox.set_last_message_id(channel_id, deferred_positions.pop(channel_id))
 
-# Initialiser le client Discord
-client = discord.Client(intents=intents)
-shiori_service = ShioriService()
+def start_catch_up():
+    """Lance le rattrapage en arrière-plan (sans effet s'il est déjà en cours)."""
+    global catch_up_task
+    if CATCHUP_LIMIT and (catch_up_task is None or catch_up_task.done()):
+        catch_up_task = asyncio.create_task(catch_up())
 
 @client.event
 async def on_ready():
     """Événement déclenché lorsque le bot est prêt."""
-    logger.info(f"{client.user} est connecté à Discord!")
-
-    # Vérifier l'existence du canal
-    if CHANNEL_ID:
-        channel = client.get_channel(CHANNEL_ID)
-        if channel:
-            logger.info(f"Canal surveillé: #{channel.name} dans {channel.guild.name}")
-        else:
-            logger.error(f"ERREUR: Canal avec ID {CHANNEL_ID} non trouvé!")
+    logger.info("%s est connecté à Discord!", client.user)
+    memory = resident_memory_mb()
+    logger.info("Prêt en %.1fs%s: %s serveurs, %s utilisateurs et %s messages en cache%s",
+                time.monotonic() - STARTED_AT, " (mode économe)" if LEAN_MODE else "",
+                len(client.guilds), len(client.users), len(client.cached_messages),
+                f", mémoire résidente max {memory:.0f} Mio" if memory else "")
+    
+    # Démarrer les workers qui envoient les URLs à Shiori et le rejeu de l'outbox
+    await ingestion_queue.start()
+    outbox_replayer.start()
+
+    # Vérifier l'existence des canaux
+    if routes:
+        for channel_id, route in routes.items():
+            channel = client.get_channel(channel_id)
+            if channel:
+                logger.info("Canal surveillé: #%s dans %s -> Shiori '%s'",
+                            channel.name, channel.guild.name, route['name'])
+            else:
+                logger.error("ERREUR: Canal avec ID %s non trouvé!", channel_id)
     else:
         logger.error("Aucun ID de canal spécifié. Veuillez configurer le fichier .env.")
+    
+    # Rattraper les messages postés pendant que le bot était arrêté ou déconnecté
+    start_catch_up()
+
+@client.event
+async def on_resumed():
+    """Événement déclenché lorsque la session Discord reprend après une déconnexion."""
+    start_catch_up()
 
 @client.event
 async def on_message(message):
     """Événement déclenché à chaque message."""
-    # Ignorer les messages du bot lui-même
-    if message.author == client.user:
-        return
+    await handle_message(message)
 
-    # Vérifier si le message est dans le canal surveillé
-    if message.channel.id == CHANNEL_ID:
-        logger.info(f"Message dans le canal surveillé: '{message.content}'")
-
-        # Extraire les URLs du message
-        url_pattern = r'(https?://[^\s]+)'
-        urls = re.findall(url_pattern, message.content)
-
-        if urls:
-            logger.info(f"URLs trouvées: {len(urls)}")
-            for url in urls:
-                logger.info(f"URL détectée: {url}")
-                try:
-                    result = await shiori_service.save_bookmark(url, message.content)
-                    if not result:
-                        logger.warning(f"L'URL n'a pas pu être enregistrée dans Shiori: {url}")
-                except Exception as e:
-                    logger.error(f"Erreur lors de l'enregistrement de l'URL: {e}", exc_info=True)
-        else:
-            logger.info("Aucune URL trouvée dans le message")
+async def main():
+    """Démarre le bot en gérant le cycle de vie des sessions Shiori."""
+    # Arrêt propre sur SIGTERM (redémarrage du conteneur) et Ctrl+C
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(client.close()))
+        except NotImplementedError:
+            pass  # Non supporté sous Windows
+    
+    # Exposition des métriques
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_PORT)
+    snapshot_task = None
+    if METRICS_LOG_INTERVAL:
+        snapshot_task = asyncio.create_task(log_snapshots(METRICS_LOG_INTERVAL))
+    
+    async with AsyncExitStack() as stack:
+        # Ouvrir le client (session HTTP partagée) de chaque cible Shiori
+        for service in shiori_services:
+            await stack.enter_async_context(service)
+            if service.dedup_warm:
+                await service.warm_seen_urls()
+        try:
+            async with client:
+                await client.start(TOKEN)
+        finally:
+            # Terminer l'envoi des URLs déjà en file avant de fermer les sessions Shiori
+            if catch_up_task:
+                catch_up_task.cancel()
+            await outbox_replayer.stop()
+            remaining = await ingestion_queue.drain(INGEST_DRAIN_TIMEOUT)
+            if remaining:
+                logger.info("%s URLs restent dans l'outbox et seront renvoyées au prochain démarrage", len(remaining))
+            outbox.close()
+            if snapshot_task:
+                snapshot_task.cancel()
+            if metrics_runner:
+                await metrics_runner.cleanup()
 
 # Lancer le bot
 if __name__ == "__main__":
     try:
         logger.info("Démarrage du bot...")
-        client.run(TOKEN)
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Arrêt du bot demandé par l'utilisateur.")
     except discord.errors.LoginFailure as e:
-        logger.error(f"Erreur d'authentification Discord: {e}")
+        logger.error("Erreur d'authentification Discord: %s", e)
         logger.error("Vérifiez votre token Discord dans le fichier .env")
     except Exception as e:
-        logger.error(f"Erreur lors du démarrage du bot: {e}", exc_info=True)
+        logger.error("Erreur lors du démarrage du bot: %s", e, exc_info=True)
         logger.error("Si vous venez de créer le bot, assurez-vous qu'il est invité dans au moins un serveur.")
\ No newline at end of file
@@ -0,0 +1,150 @@
+import time
+import sqlite3
+
+
+class ImportCheckpoint:
+    """Point de reprise persistant (SQLite) pour l'importation de l'historique.
+
+    Enregistre le résultat de chaque URL ainsi que la position dans le canal:
+    l'id du dernier message dont toutes les URLs (et celles des messages
+    précédents) ont été traitées. Cette position n'a de sens que lorsque
+    l'historique est parcouru du plus ancien au plus récent.
+    """
+
+    def __init__(self, path, channel_id, track_position=True):
+        self.path = path
+        self.channel_id = channel_id
+        self.track_position = track_position
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                message_id INTEGER NOT NULL,
+                excerpt TEXT,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                bookmark_id INTEGER,
+                archived INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        # Point de reprise créé avant le mode par lots: ajouter les colonnes d'archivage
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(urls)")]
+        if 'bookmark_id' not in columns:
+            self.db.execute("ALTER TABLE urls ADD COLUMN bookmark_id INTEGER")
+            self.db.execute("ALTER TABLE urls ADD COLUMN archived INTEGER NOT NULL DEFAULT 1")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS position (
+                channel_id INTEGER PRIMARY KEY,
+                last_message_id INTEGER NOT NULL
+            )
+        """)
+        self.db.commit()
+
+        # URLs en cours par message, dans l'ordre de distribution aux workers
+        self._pending = {}
+        self._last_message_id = self.last_message_id()
+
+    def last_message_id(self):
+        """Retourne l'id du dernier message entièrement traité (ou None)."""
+        row = self.db.execute(
+            "SELECT last_message_id FROM position WHERE channel_id = ?", (self.channel_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def reset_position(self):
+        """Oublie la position dans le canal (nouvel import sans --resume)."""
+        self.db.execute("DELETE FROM position WHERE channel_id = ?", (self.channel_id,))
+        self.db.commit()
+        self._last_message_id = None
+
+    def succeeded(self, url):
+        """Indique si l'URL a déjà été importée avec succès."""
+        row = self.db.execute("SELECT status FROM urls WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] == 'success'
+
+    def failed_records(self):
+        """Retourne les URLs en échec, à retenter lors d'une reprise.
+
+        Ces URLs (marquées `retry`) sont envoyées avant le parcours du canal:
+        elles n'entrent pas dans le calcul de la position.
+        """
+        rows = self.db.execute(
+            "SELECT message_id, url, excerpt FROM urls WHERE status = 'failed' ORDER BY message_id"
+        ).fetchall()
+        return [{'message_id': message_id, 'url': url, 'excerpt': excerpt or '', 'retry': True}
+                for message_id, url, excerpt in rows]
+
+    def pending_archive(self, limit=20):
+        """Retourne les ids de bookmarks créés sans archive, à archiver."""
+        rows = self.db.execute(
+            "SELECT bookmark_id FROM urls WHERE status = 'success' AND archived = 0 AND bookmark_id IS NOT NULL "
+            "ORDER BY message_id LIMIT ?", (limit,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_pending_archive(self):
+        return self.db.execute(
+            "SELECT COUNT(*) FROM urls WHERE status = 'success' AND archived = 0 AND bookmark_id IS NOT NULL"
+        ).fetchone()[0]
+
+    def mark_archived(self, bookmark_ids):
+        """Marque un lot de bookmarks comme archivés."""
+        self.db.executemany("UPDATE urls SET archived = 1 WHERE bookmark_id = ?", [(i,) for i in bookmark_ids])
+        self.db.commit()
+
+    def dispatch(self, record):
+        """Signale qu'une URL vient d'être confiée aux workers.
+
+        Les URLs du parcours arrivent dans l'ordre des messages; une URL
+        retentée ne suit pas cet ordre et n'est pas suivie.
+        """
+        message_id = record['message_id']
+        if not self.track_position or record.get('retry'):
+            return
+        if self._last_message_id is not None and message_id <= self._last_message_id:
+            return
+        self._pending[message_id] = self._pending.get(message_id, 0) + 1
+
+    def complete(self, record, success, bookmark_id=None, archived=True):
+        """Enregistre le résultat d'une URL et avance la position si possible.
+
+        `archived` vaut False pour un bookmark créé sans archive, à compléter
+        lors de la phase d'archivage. Un succès déjà enregistré n'est remplacé
+        ni par un échec, ni par un doublon ignoré (succès sans bookmark_id):
+        le bookmark créé reste à archiver.
+        """
+        self.db.execute(
+            "INSERT INTO urls (url, message_id, excerpt, status, updated_at, bookmark_id, archived) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET message_id = excluded.message_id, excerpt = excluded.excerpt, "
+            "status = excluded.status, updated_at = excluded.updated_at, bookmark_id = excluded.bookmark_id, "
+            "archived = excluded.archived "
+            "WHERE NOT (urls.status = 'success' AND (excluded.status = 'failed' "
+            "OR (urls.bookmark_id IS NOT NULL AND excluded.bookmark_id IS NULL)))",
+            (record['url'], record['message_id'], record.get('excerpt'),
+             'success' if success else 'failed', time.time(), bookmark_id, int(archived))
+        )
+
+        message_id = record['message_id']
+        if not record.get('retry') and message_id in self._pending:
+            self._pending[message_id] -= 1
+            # La position n'avance que sur un préfixe continu de messages terminés
+            advanced = None
+            for pending_id in list(self._pending):
+                if self._pending[pending_id] > 0:
+                    break
+                del self._pending[pending_id]
+                advanced = pending_id
+            if advanced is not None and (self._last_message_id is None or advanced > self._last_message_id):
+                self._last_message_id = advanced
+                self.db.execute(
+                    "INSERT OR REPLACE INTO position (channel_id, last_message_id) VALUES (?, ?)",
+                    (self.channel_id, advanced)
+                )
+
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,87 @@
+import sqlite3
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Paramètres de suivi retirés lors de la normalisation des URLs
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'yclid', '_hsenc', '_hsmi'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Normalise une URL pour la détection des doublons.
+
+    Met le schéma et l'hôte en minuscules, retire le port par défaut, le
+    fragment, les paramètres de suivi (utm_*, fbclid...) et la barre oblique
+    finale du chemin.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username:
+        credentials = parts.username + (f":{parts.password}" if parts.password else '')
+        host = f"{credentials}@{host}"
+
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS]
+
+    return urlunsplit((scheme, host, parts.path.rstrip('/'), urlencode(query), ''))
+
+
+class SeenUrls:
+    """Ensemble des URLs déjà enregistrées dans Shiori.
+
+    Un cache LRU borné en mémoire répond aux URLs récentes; l'index complet
+    est conservé dans un fichier SQLite pour survivre aux redémarrages.
+    """
+
+    def __init__(self, path, cache_size=10000):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.db = sqlite3.connect(path or ':memory:')
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY)")
+        self.db.commit()
+
+    def _remember(self, key):
+        self.cache[key] = True
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def __contains__(self, url):
+        key = normalize_url(url)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return True
+        if self.db.execute("SELECT 1 FROM seen WHERE url = ?", (key,)).fetchone():
+            self._remember(key)
+            return True
+        return False
+
+    def add(self, url):
+        """Marque une URL comme enregistrée."""
+        self.add_many([url])
+
+    def add_many(self, urls):
+        """Marque plusieurs URLs comme enregistrées en une seule transaction."""
+        keys = [normalize_url(url) for url in urls]
+        self.db.executemany("INSERT OR IGNORE INTO seen (url) VALUES (?)", [(key,) for key in keys])
+        self.db.commit()
+        for key in keys:
+            self._remember(key)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import aiohttp
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from dedup import normalize_url
+from metrics import REGISTRY, Counter
+
+logger = logging.getLogger('discord-shiori-bot.enrichment')
+
+PAGE_FETCHES = REGISTRY.register(Counter(
+    'page_fetches_total', "Pages téléchargées pour l'enrichissement par résultat (success, cached, error)",
+    ('outcome',)))
+
+
+def parse_page(html):
+    """Extrait le titre et la description d'une page HTML (balises Open Graph en priorité)."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def meta(*names):
+        for name in names:
+            tag = soup.find('meta', attrs={'property': name}) or soup.find('meta', attrs={'name': name})
+            if tag and tag.get('content', '').strip():
+                return tag['content'].strip()
+        return None
+
+    title = meta('og:title', 'twitter:title')
+    if not title and soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    description = meta('og:description', 'description', 'twitter:description')
+    return title or None, description or None
+
+
+class PageEnricher:
+    """Enrichit les bookmarks avec les métadonnées de leur page avant l'envoi à Shiori.
+
+    Chaque page est téléchargée une seule fois (session HTTP partagée,
+    nombre de téléchargements simultanés limité), et son titre et sa
+    description sont extraits avec BeautifulSoup. Les résultats sont gardés
+    dans un cache LRU à durée de vie limitée, indexé par URL normalisée.
+    Une page inaccessible n'est gardée en cache que brièvement.
+    Des règles par domaine ajoutent des tags et peuvent désactiver
+    l'archivage par Shiori.
+    """
+
+    def __init__(self, rules=None):
+        self.concurrency = int(os.getenv('ENRICH_CONCURRENCY', 4))  # Téléchargements simultanés max
+        self.timeout = float(os.getenv('ENRICH_TIMEOUT', 10))  # secondes
+        self.max_bytes = int(os.getenv('ENRICH_MAX_BYTES', 512 * 1024))  # Début de page lu au maximum
+        self.cache_size = int(os.getenv('ENRICH_CACHE_SIZE', 1000))
+        self.cache_ttl = float(os.getenv('ENRICH_CACHE_TTL', 86400))  # secondes
+        self.error_ttl = float(os.getenv('ENRICH_ERROR_TTL', 60))  # secondes, pour une page inaccessible
+        self.domain_tags = os.getenv('ENRICH_DOMAIN_TAG', '1') == '1'  # Ajouter le domaine en tag
+        self.rules = rules if rules is not None else self._load_rules(os.getenv('ENRICH_RULES'))
+        self.cache = OrderedDict()  # URL normalisée -> (expiration, métadonnées)
+        self.pending = {}  # URL normalisée -> tâche de téléchargement en cours
+        self.session = None
+        self._semaphore = None  # Créé à la première utilisation pour être lié à la bonne boucle asyncio
+
+    @staticmethod
+    def _load_rules(path):
+        """Charge les règles par domaine: {"youtube.com": {"tags": ["vidéo"], "archive": false}}."""
+        if not path:
+            return {}
+        with open(path) as f:
+            return {domain.lower(): rule for domain, rule in json.load(f).items()}
+
+    async def start(self):
+        """Ouvre la session HTTP partagée si elle n'existe pas déjà."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': 'Mozilla/5.0 (compatible; discord-shiori-bot)'}
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def rule_for(self, host):
+        """Retourne la règle du domaine le plus précis correspondant à l'hôte (ou {})."""
+        parts = host.split('.')
+        for i in range(len(parts)):
+            rule = self.rules.get('.'.join(parts[i:]))
+            if rule is not None:
+                return rule
+        return {}
+
+    async def enrich(self, url):
+        """Retourne les métadonnées de la page: {'title', 'description', 'tags', 'archive'}."""
+        key = normalize_url(url)
+        cached = self.cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.cache.move_to_end(key)
+            PAGE_FETCHES.inc(outcome='cached')
+            return cached[1]
+
+        # Une seule requête par page, même si plusieurs messages la citent en même temps
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._enrich(url, key))
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _enrich(self, url, key):
+        host = (urlsplit(url).hostname or '').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        rule = self.rule_for(host)
+        tags = list(rule.get('tags', []))
+        if self.domain_tags and host and host not in tags:
+            tags.append(host)
+
+        page = await self._fetch(url)
+        title, description = page or (None, None)
+        metadata = {'title': title, 'description': description, 'tags': tags,
+                    'archive': rule.get('archive', True)}
+
+        # Un échec (timeout, erreur réseau ou HTTP) est souvent passager: le retenter bientôt
+        ttl = self.cache_ttl if page is not None else self.error_ttl
+        self.cache[key] = (time.monotonic() + ttl, metadata)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return metadata
+
+    async def _fetch(self, url):
+        """Télécharge le début de la page et retourne (titre, description), ou None en cas d'échec."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                session = await self.start()
+                async with session.get(url) as resp:
+                    if resp.status >= 400 or 'html' not in resp.headers.get('Content-Type', ''):
+                        PAGE_FETCHES.inc(outcome='error')
+                        return None
+                    # read(n) ne retourne que les données déjà reçues: lire jusqu'à max_bytes ou la fin
+                    chunks = []
+                    size = 0
+                    async for chunk in resp.content.iter_chunked(64 * 1024):
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.max_bytes:
+                            break
+                    html = b''.join(chunks)[:self.max_bytes].decode(resp.charset or 'utf-8', errors='replace')
+            # L'analyse HTML est faite hors de la boucle asyncio pour ne pas la bloquer
+            result = await asyncio.get_running_loop().run_in_executor(None, parse_page, html)
+            PAGE_FETCHES.inc(outcome='success')
+            return result
+        except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+            PAGE_FETCHES.inc(outcome='error')
+            logger.debug("Impossible de récupérer les métadonnées de %s: %s", url, e)
+            return None
+
+
+def enricher_from_env():
+    """Crée l'enrichisseur si ENRICH_ENABLED=1, sinon retourne None."""
+    if os.getenv('ENRICH_ENABLED', '0') != '1':
+        return None
+    return PageEnricher()
@@ -1,27 +1,32 @@
 #!/usr/bin/env python3
 import os
-import re
 import sys
+import json
 import asyncio
 import logging
 import argparse
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import discord
 
 # Importer le service Shiori existant
 from shiori_service import ShioriService
-
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger('import-history')
+from rate_limit import TokenBucket
+from checkpoint import ImportCheckpoint
+from import_plan import ImportPlan, read_plan
+from dedup import normalize_url
+from enrichment import enricher_from_env
+from url_extractor import extract_message_urls
+from metrics import REGISTRY, URLS_PER_MESSAGE
+from log_config import setup_logging
 
 # Charger les variables d'environnement
 load_dotenv()
 
+# Configuration du logging (écriture en arrière-plan, niveaux par sous-système via LOG_LEVELS)
+setup_logging()
+logger = logging.getLogger('import-history')
+
 # ============================================================================ #
 # CONFIGURATION - Modifiez ces variables pour exécuter depuis VSCode            #
 # ============================================================================ #
@@ -29,40 +34,284 @@ load_dotenv()
 DAYS = None
 # Nombre maximum de messages à récupérer (None = pas de limite)
 LIMIT = None  
-# Nombre d'URLs à traiter par lot
-BATCH_SIZE = 10  # Réduit à 10 pour éviter les problèmes de verrouillage de BDD
-# Délai entre les requêtes individuelles (en secondes)
-REQUEST_DELAY = 0.5  # Ajoute un délai entre chaque requête
-# Délai entre les lots (en secondes)
-BATCH_DELAY = 5  # Augmenté pour laisser la BDD se libérer entre les lots
+# Nombre maximum de requêtes simultanées vers Shiori (workers). Le nombre effectif
+# est ajusté par la limite adaptative de ShioriService selon la latence et les erreurs.
+CONCURRENCY = 8
+# Débit maximum vers Shiori (en requêtes par seconde, 0 = pas de limite autre que la limite adaptative)
+RATE = 0
 # Inverser l'ordre d'importation (True = du plus ancien au plus récent)
 REVERSE_ORDER = True
+# Nombre de fenêtres de temps parcourues en parallèle dans l'historique (1 = parcours séquentiel)
+WINDOWS = 1
+# Nombre maximum d'URLs lues d'avance et gardées en mémoire par fenêtre en attente d'importation
+WINDOW_BUFFER = 1000
 # Mode simulation (True = afficher les URLs sans les envoyer à Shiori)
 DRY_RUN = False  
 # Mode verbeux (True = afficher plus de détails)
 VERBOSE = True  
+# Fichier de point de reprise (SQLite) pour reprendre un import interrompu
+CHECKPOINT_FILE = 'import_checkpoint.db'
+# Mode par lots: nombre de bookmarks archivés par requête et pause entre deux lots (en secondes)
+ARCHIVE_BATCH_SIZE = 20
+ARCHIVE_DELAY = 5
+# Longueur maximale de l'extrait de message conservé et envoyé à Shiori
+EXCERPT_LENGTH = 500
+# Durée moyenne estimée d'un enregistrement dans Shiori (en secondes), pour le plan du mode simulation
+ESTIMATED_LATENCY = 3.0
 # ============================================================================ #
 
 # Configuration depuis .env
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 DISCORD_CHANNEL_ID = int(os.getenv('DISCORD_CHANNEL_ID', 0))
 
-# Fonction pour extraire les URLs d'un texte
-def extract_urls(text):
-    """Extrait les URLs d'un texte."""
-    if not text:
-        return []
+async def scan_history(channel, bot_user, limit=None, after=None, oldest_first=False, stats=None,
+                       before=None, label="Progression"):
+    """Parcourt l'historique du canal et produit les URLs au fil de l'eau.
+
+    Seul un enregistrement compact est conservé par URL (id du message, URL et
+    extrait tronqué du message), sans matérialiser l'historique complet.
+    """
+    if stats is None:
+        stats = {'messages': 0, 'urls': 0}
+    
+    async for message in channel.history(limit=limit, after=after, before=before, oldest_first=oldest_first):
+        stats['messages'] += 1
+        
+        if message.author != bot_user:  # Ignorer les messages du bot
+            urls = extract_message_urls(message)
+            URLS_PER_MESSAGE.observe(len(urls))
+            for url in urls:
+                stats['urls'] += 1
+                yield {
+                    'message_id': message.id,
+                    'url': url,
+                    'excerpt': message.content[:EXCERPT_LENGTH]
+                }
+        
+        if stats['messages'] % 100 == 0:
+            logger.info("%s: %s messages traités, %s URLs trouvées", label, stats['messages'], stats['urls'])
+
+async def scan_latest_history(channel, bot_user, limit, after=None, oldest_first=False, stats=None):
+    """Produit les URLs des `limit` messages les plus récents du canal.
+
+    Les messages sont toujours demandés du plus récent au plus ancien, pour
+    que --limit porte sur les derniers messages; avec `oldest_first`, les
+    enregistrements (au plus `limit` messages) sont ensuite remis dans
+    l'ordre chronologique.
+    """
+    records = scan_history(channel, bot_user, limit=limit, after=after, oldest_first=False, stats=stats)
+    if not oldest_first:
+        async for record in records:
+            yield record
+        return
+    
+    buffered = [record async for record in records]
+    # Tri stable: les URLs d'un même message gardent leur ordre
+    buffered.sort(key=lambda record: record['message_id'])
+    for record in buffered:
+        yield record
+
+async def scan_history_windows(channel, bot_user, windows, after=None, oldest_first=False, stats=None):
+    """Parcourt l'historique en parallèle sur `windows` fenêtres de temps.
+
+    La période (depuis `after`, ou depuis la création du canal) est découpée
+    en fenêtres de même durée, bornées par des ids de messages (snowflakes,
+    dont les bits de poids fort sont l'horodatage). Les fenêtres sont
+    parcourues simultanément, discord.py se chargeant de respecter les
+    limites de débit de Discord, et leurs URLs sont restituées dans l'ordre
+    chronologique (ou antichronologique) comme avec scan_history. Chaque
+    fenêtre lit au plus WINDOW_BUFFER URLs d'avance, puis attend que les
+    fenêtres précédentes soient consommées.
+    """
+    if stats is None:
+        stats = {'messages': 0, 'urls': 0}
+    
+    # Bornes de la période en ids de messages: l'id du canal date sa création
+    if isinstance(after, datetime):
+        low = discord.utils.time_snowflake(after)
+    elif after is not None:
+        low = after.id
+    else:
+        low = channel.id
+    high = discord.utils.time_snowflake(datetime.now(timezone.utc))
+    bounds = [low + (high - low) * i // windows for i in range(windows + 1)]
+    
+    queues = [asyncio.Queue(maxsize=WINDOW_BUFFER) for _ in range(windows)]
+    window_stats = [{'messages': 0, 'urls': 0} for _ in range(windows)]
+    
+    async def scan_window(i):
+        # Fenêtre ]bounds[i], bounds[i + 1]]; la dernière reste ouverte vers le présent
+        before = discord.Object(id=bounds[i + 1] + 1) if i < windows - 1 else None
+        label = (f"Fenêtre {i + 1}/{windows} "
+                 f"({discord.utils.snowflake_time(bounds[i]):%Y-%m-%d} → "
+                 f"{discord.utils.snowflake_time(bounds[i + 1]):%Y-%m-%d})")
+        try:
+            async for record in scan_history(channel, bot_user, after=discord.Object(id=bounds[i]),
+                                             before=before, oldest_first=oldest_first,
+                                             stats=window_stats[i], label=label):
+                # File pleine: la lecture de la fenêtre reprend quand le consommateur la vide
+                await queues[i].put(record)
+            logger.info("%s terminée: %s messages, %s URLs",
+                        label, window_stats[i]['messages'], window_stats[i]['urls'])
+        except asyncio.CancelledError:
+            raise  # Parcours abandonné: personne n'attend plus la fenêtre
+        except Exception:
+            # Sentinelle de fin de fenêtre, pour que le consommateur propage l'erreur
+            await queues[i].put(None)
+            raise
+        await queues[i].put(None)
+    
+    logger.info("Parcours de l'historique en %s fenêtres parallèles", windows)
+    tasks = [asyncio.create_task(scan_window(i)) for i in range(windows)]
+    try:
+        # Les fenêtres sont disjointes et ordonnées: il suffit de les vider l'une après l'autre
+        for i in (range(windows) if oldest_first else reversed(range(windows))):
+            while True:
+                record = await queues[i].get()
+                if record is None:
+                    break
+                yield record
+            # Propager une éventuelle erreur du parcours de la fenêtre
+            await tasks[i]
+            stats['messages'] += window_stats[i]['messages']
+            stats['urls'] += window_stats[i]['urls']
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def run_import_pipeline(shiori_service, messages, concurrency=8, rate=0,
+                              checkpoint=None, skip_succeeded=False, create_archive=True):
+    """Importe les URLs dans Shiori via une file et un pool de workers.
+
+    `messages` est un itérable asynchrone qui alimente la file (producteur);
+    `concurrency` workers la vident en respectant un débit maximum de `rate`
+    requêtes par seconde (seau de jetons). Si `checkpoint` est fourni, le
+    résultat de chaque URL y est enregistré et, avec `skip_succeeded`, les
+    URLs déjà importées sont ignorées. Avec `create_archive=False`, les
+    bookmarks sont créés sans archive (voir run_archive_backfill).
+    Retourne (succès, échecs).
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    bucket = TokenBucket(rate)
+    stats = {'success': 0, 'fail': 0, 'skipped': 0}
+    
+    async def worker():
+        while True:
+            msg = await queue.get()
+            try:
+                # Sentinelle de fin: plus rien à traiter
+                if msg is None:
+                    return
+                await bucket.acquire()
+                bookmark = await shiori_service.create_bookmark(msg['url'], msg['excerpt'],
+                                                                create_archive=create_archive)
+                result = bookmark is not None
+                if result:
+                    stats['success'] += 1
+                else:
+                    stats['fail'] += 1
+                if checkpoint:
+                    # Une URL dont l'archivage est désactivé par une règle n'est pas à archiver plus tard
+                    archived = create_archive or not (bookmark or {}).get('archive', True)
+                    checkpoint.complete(msg, result, (bookmark or {}).get('id'), archived=archived)
+                
+                done = stats['success'] + stats['fail']
+                if done % 10 == 0:
+                    logger.info("Progression de l'importation: %s URLs traitées (%s échecs, limite adaptative: %s)",
+                                done, stats['fail'], shiori_service.limiter.current_limit)
+            except Exception as e:
+                stats['fail'] += 1
+                logger.error("Erreur lors de l'importation de %s: %s", msg['url'], e, exc_info=True)
+                if checkpoint:
+                    checkpoint.complete(msg, False)
+            finally:
+                queue.task_done()
+    
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        async for msg in messages:
+            if checkpoint:
+                if skip_succeeded and checkpoint.succeeded(msg['url']):
+                    stats['skipped'] += 1
+                    continue
+                checkpoint.dispatch(msg)
+            await queue.put(msg)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    
+    if stats['skipped']:
+        logger.info("%s URLs déjà importées ignorées (point de reprise)", stats['skipped'])
+    return stats['success'], stats['fail']
+
+async def run_archive_backfill(shiori_service, checkpoint, batch_size=20, delay=5):
+    """Archive par lots les bookmarks créés sans archive (mode --bulk).
+
+    La progression est enregistrée dans le point de reprise: la phase peut être
+    interrompue puis relancée avec --archive-only. Retourne le nombre de
+    bookmarks archivés.
+    """
+    total = checkpoint.count_pending_archive()
+    if not total:
+        logger.info("Aucun bookmark à archiver.")
+        return 0
     
-    url_pattern = r'(https?://[^\s]+)'
-    urls = re.findall(url_pattern, text)
+    logger.info("Archivage de %s bookmarks par lots de %s (pause de %ss entre les lots)...", total, batch_size, delay)
+    archived = 0
+    while True:
+        ids = checkpoint.pending_archive(batch_size)
+        if not ids:
+            break
+        if not await shiori_service.archive_bookmarks(ids):
+            logger.error("Archivage interrompu après %s/%s bookmarks. Relancez avec --archive-only pour reprendre.",
+                         archived, total)
+            break
+        checkpoint.mark_archived(ids)
+        archived += len(ids)
+        logger.info("Progression de l'archivage: %s/%s bookmarks archivés", archived, total)
+        # Pause entre les lots pour laisser la base de données de Shiori se libérer
+        await asyncio.sleep(delay)
     
-    return urls
+    return archived
+
+async def _plan_records(path):
+    """Produit les URLs à importer d'un plan exporté par --dry-run --plan."""
+    for record in read_plan(path):
+        yield record
+
+async def fetch_existing_urls():
+    """Retourne les URLs normalisées déjà présentes dans Shiori (None si Shiori est injoignable)."""
+    try:
+        # Simple lecture: ni index des doublons ni token écrits sur disque
+        async with ShioriService(persist=False) as shiori_service:
+            logger.info("Recherche des bookmarks déjà présents dans Shiori...")
+            existing = set()
+            async for url in shiori_service.fetch_bookmark_urls():
+                existing.add(normalize_url(url))
+            logger.info("%s bookmarks déjà présents dans Shiori", len(existing))
+            return existing
+    except Exception as e:
+        logger.warning("Impossible de lister les bookmarks de Shiori, le plan ne les exclura pas: %s", e)
+        return None
+
+async def _resume_records(retries, records):
+    """Enchaîne les URLs en échec à retenter puis les nouveaux messages du canal."""
+    for record in retries:
+        yield record
+    async for record in records:
+        yield record
 
 # Fonction principale pour récupérer et importer les messages
-async def import_history(days=None, limit=None, batch_size=10, request_delay=0.5, batch_delay=5, 
-                        reverse_order=False, dry_run=False):
+async def import_history(days=None, limit=None, concurrency=8, rate=0,
+                        reverse_order=False, dry_run=False, resume=False, windows=1,
+                        checkpoint_file=CHECKPOINT_FILE, bulk=False, archive_only=False,
+                        archive_batch_size=ARCHIVE_BATCH_SIZE, archive_delay=ARCHIVE_DELAY,
+                        plan_file=None, from_plan=None, estimated_latency=ESTIMATED_LATENCY):
     """Récupère et importe l'historique des messages."""
-    if not all([DISCORD_TOKEN, DISCORD_CHANNEL_ID]):
+    if not from_plan and not all([DISCORD_TOKEN, DISCORD_CHANNEL_ID]):
         logger.error("Configuration incomplète. Vérifiez les variables d'environnement.")
         return
 
@@ -70,128 +319,161 @@ async def import_history(days=None, limit=None, batch_size=10, request_delay=0.5
     shiori_service = None
     if not dry_run:
         shiori_service = ShioriService()
+        shiori_service.enricher = enricher_from_env()
         try:
-            # Tester l'authentification
+            # Ouvrir la session HTTP partagée puis tester l'authentification
+            await shiori_service.start()
             logger.info("Test de connexion à Shiori...")
             token = await shiori_service.authenticate()
             if not token:
                 logger.error("Impossible de s'authentifier auprès de Shiori. Import annulé.")
                 logger.info("Utilisez --dry-run pour récupérer les URLs sans tenter de les envoyer à Shiori.")
+                await shiori_service.close()
                 return
             logger.info("Connexion à Shiori établie avec succès!")
+            if shiori_service.dedup_warm:
+                await shiori_service.warm_seen_urls()
         except Exception as e:
-            logger.error(f"Erreur lors de la connexion à Shiori: {e}")
+            logger.error("Erreur lors de la connexion à Shiori: %s", e)
             logger.info("Utilisez --dry-run pour récupérer les URLs sans tenter de les envoyer à Shiori.")
+            await shiori_service.close()
             return
     
+    # Le point de reprise n'est utile que lorsque des URLs sont réellement envoyées.
+    # Un plan n'a pas de position dans le canal: seuls les résultats par URL sont suivis.
+    checkpoint = None
+    if not dry_run:
+        checkpoint = ImportCheckpoint(checkpoint_file, DISCORD_CHANNEL_ID,
+                                      track_position=reverse_order and not from_plan)
+    
+    # Archivage seul des bookmarks créés par un import --bulk: Discord n'est pas nécessaire
+    if archive_only and checkpoint:
+        try:
+            await run_archive_backfill(shiori_service, checkpoint, archive_batch_size, archive_delay)
+        finally:
+            await shiori_service.close()
+            checkpoint.close()
+        return
+    
+    # Importer un plan exporté par une simulation, sans relire Discord
+    if from_plan and not dry_run:
+        try:
+            logger.info("Importation du plan %s vers Shiori (%s workers, %s req/s)...",
+                        from_plan, concurrency, rate or 'illimité')
+            success_count, fail_count = await run_import_pipeline(
+                shiori_service, _plan_records(from_plan), concurrency=concurrency, rate=rate,
+                checkpoint=checkpoint, skip_succeeded=True, create_archive=not bulk
+            )
+            logger.info("Importation terminée. %s URLs importées avec succès, %s échecs.", success_count, fail_count)
+            if bulk:
+                await run_archive_backfill(shiori_service, checkpoint, archive_batch_size, archive_delay)
+        finally:
+            await shiori_service.close()
+            checkpoint.close()
+        return
+    
+    # En simulation, exclure du plan les URLs déjà présentes dans Shiori (si Shiori est configuré)
+    existing_urls = None
+    if dry_run and os.getenv('SHIORI_API_URL'):
+        existing_urls = await fetch_existing_urls()
+    
     # Configurer le client Discord
     intents = discord.Intents.default()
     intents.message_content = True
     client = discord.Client(intents=intents)
     
-    # Variables pour stocker les résultats
-    messages_with_urls = []
-    
     @client.event
     async def on_ready():
-        logger.info(f"{client.user} est connecté à Discord!")
+        logger.info("%s est connecté à Discord!", client.user)
         
         try:
             # Récupérer le canal
             channel = client.get_channel(DISCORD_CHANNEL_ID)
             if not channel:
-                logger.error(f"Canal avec ID {DISCORD_CHANNEL_ID} non trouvé!")
+                logger.error("Canal avec ID %s non trouvé!", DISCORD_CHANNEL_ID)
                 await client.close()
                 return
             
-            logger.info(f"Récupération des messages du canal #{channel.name} dans {channel.guild.name}")
+            logger.info("Récupération des messages du canal #%s dans %s", channel.name, channel.guild.name)
             
             # Définir la date limite si spécifiée
             after = None
             if days:
                 after = datetime.now() - timedelta(days=days)
-                logger.info(f"Récupération des messages après {after.strftime('%Y-%m-%d')}")
+                logger.info("Récupération des messages après %s", after.strftime('%Y-%m-%d'))
             
-            # Compteurs
-            processed_count = 0
-            urls_found = 0
+            # Reprendre après le dernier message entièrement traité
+            retries = []
+            if checkpoint and resume:
+                last_message_id = checkpoint.last_message_id()
+                if last_message_id and (after is None or last_message_id > discord.utils.time_snowflake(after)):
+                    after = discord.Object(id=last_message_id)
+                    logger.info("Reprise après le message %s", last_message_id)
+                retries = checkpoint.failed_records()
+                if retries:
+                    logger.info("%s URLs en échec seront retentées", len(retries))
+            elif checkpoint:
+                checkpoint.reset_position()
             
-            # Récupérer les messages
-            # Par défaut, les messages sont récupérés du plus récent au plus ancien
-            messages_history = []
-            async for message in channel.history(limit=limit, after=after, oldest_first=False):
-                processed_count += 1
-                
-                if message.author != client.user:  # Ignorer les messages du bot
-                    urls = extract_urls(message.content)
-                    
-                    if urls:
-                        urls_found += len(urls)
-                        for url in urls:
-                            messages_history.append({
-                                'message_id': message.id,
-                                'author': str(message.author),
-                                'content': message.content,
-                                'timestamp': message.created_at,
-                                'url': url
-                            })
-                
-                if processed_count % 100 == 0:
-                    logger.info(f"Progression: {processed_count} messages traités, {urls_found} URLs trouvées")
-            
-            logger.info(f"Récupération terminée. {processed_count} messages traités, {len(messages_history)} messages avec URLs trouvés.")
-            
-            # Inverser l'ordre des messages si demandé (pour les traiter du plus ancien au plus récent)
+            # Par défaut, les messages sont récupérés du plus récent au plus ancien.
+            # Avec --reverse, Discord les renvoie directement du plus ancien au plus récent,
+            # ce qui évite de charger tout l'historique en mémoire pour le trier. Avec --limit,
+            # seuls les messages les plus récents sont lus, puis remis dans l'ordre chronologique.
             if reverse_order:
-                logger.info("Inversion de l'ordre des messages (traitement du plus ancien au plus récent)...")
-                messages_history.sort(key=lambda x: x['timestamp'])
-                messages_with_urls = messages_history
+                logger.info("Traitement du plus ancien au plus récent...")
+            scan_stats = {'messages': 0, 'urls': 0}
+            if windows > 1 and limit:
+                logger.warning("--limit porte sur les messages les plus récents: "
+                               "parcours séquentiel de l'historique malgré --windows")
+            if limit:
+                records = scan_latest_history(channel, client.user, limit, after=after,
+                                              oldest_first=reverse_order, stats=scan_stats)
+            elif windows > 1:
+                records = scan_history_windows(channel, client.user, windows, after=after,
+                                               oldest_first=reverse_order, stats=scan_stats)
             else:
-                messages_with_urls = messages_history
+                records = scan_history(channel, client.user, limit=limit, after=after,
+                                       oldest_first=reverse_order, stats=scan_stats)
             
-            # Si mode simulation, afficher seulement les informations
+            # Si mode simulation, calculer seulement le plan d'importation
             if dry_run:
                 logger.info("Mode simulation activé. Aucune URL ne sera envoyée à Shiori.")
-                for msg in messages_with_urls:
-                    logger.info(f"URL: {msg['url']}")
-                    logger.info(f"  Message: {msg['content'][:50]}...")
-                    logger.info(f"  Auteur: {msg['author']}")
-                    logger.info(f"  Date: {msg['timestamp']}")
-                    logger.info("---")
+                plan = ImportPlan(existing_urls, plan_file)
+                try:
+                    async for record in records:
+                        status = plan.add(record)
+                        logger.debug("%s [%s] message %s", record['url'], status, record['message_id'])
+                finally:
+                    plan.close()
+                # Le nombre de requêtes simultanées est aussi plafonné par la limite adaptative de Shiori
+                effective_concurrency = min(concurrency, int(os.getenv('SHIORI_ADAPTIVE_MAX', 8)))
+                plan.log_summary(scan_stats['messages'], effective_concurrency, rate, estimated_latency)
             else:
-                # Importer les URLs dans Shiori
-                total_urls = len(messages_with_urls)
-                success_count = 0
-                fail_count = 0
+                # Importer les URLs dans Shiori au fur et à mesure de leur découverte
+                logger.info("Début de l'importation vers Shiori (%s workers, %s req/s%s)...",
+                            concurrency, rate or 'illimité', ', sans archive' if bulk else '')
                 
-                logger.info(f"Début de l'importation de {total_urls} URLs vers Shiori...")
+                success_count, fail_count = await run_import_pipeline(
+                    shiori_service, _resume_records(retries, records),
+                    concurrency=concurrency, rate=rate,
+                    checkpoint=checkpoint, skip_succeeded=resume,
+                    create_archive=not bulk
+                )
                 
-                # Traiter par lots
-                for i in range(0, total_urls, batch_size):
-                    batch = messages_with_urls[i:i+batch_size]
-                    logger.info(f"Traitement du lot {i//batch_size + 1}/{(total_urls-1)//batch_size + 1} ({len(batch)} URLs)")
-                    
-                    for msg in batch:
-                        result = await shiori_service.save_bookmark(msg['url'], msg['content'])
-                        if result:
-                            success_count += 1
-                        else:
-                            fail_count += 1
-                        
-                        # Délai entre chaque requête pour éviter le verrouillage de la base de données
-                        await asyncio.sleep(request_delay)
-                    
-                    # Pause plus longue entre les lots pour permettre à SQLite de libérer les verrous
-                    if i + batch_size < total_urls:
-                        logger.info(f"Pause de {batch_delay} secondes entre les lots pour éviter le verrouillage de la base de données...")
-                        await asyncio.sleep(batch_delay)
+                logger.info("Récupération terminée. %s messages traités, %s URLs trouvées.",
+                            scan_stats['messages'], scan_stats['urls'])
+                logger.info("Importation terminée. %s URLs importées avec succès, %s échecs.",
+                            success_count, fail_count)
                 
-                logger.info(f"Importation terminée. {success_count} URLs importées avec succès, {fail_count} échecs.")
+                # Mode par lots: archiver ensuite, à débit limité, les bookmarks créés sans archive
+                if bulk:
+                    await run_archive_backfill(shiori_service, checkpoint, archive_batch_size, archive_delay)
+                logger.info("Métriques: %s", json.dumps(REGISTRY.snapshot(), ensure_ascii=False))
             
             await client.close()
             
         except Exception as e:
-            logger.error(f"Erreur lors de l'exécution: {e}", exc_info=True)
+            logger.error("Erreur lors de l'exécution: %s", e, exc_info=True)
             await client.close()
     
     # Fermer proprement les connexions pour éviter l'erreur "Unclosed connector"
@@ -200,25 +482,43 @@ async def import_history(days=None, limit=None, batch_size=10, request_delay=0.5
     try:
         await client.start(DISCORD_TOKEN)
     except Exception as e:
-        logger.error(f"Erreur lors de la connexion à Discord: {e}", exc_info=True)
+        logger.error("Erreur lors de la connexion à Discord: %s", e, exc_info=True)
     finally:
         # S'assurer que le client Discord est correctement fermé
         if not client.is_closed():
             await client.close()
+        # Fermer la session HTTP partagée avec Shiori
+        if shiori_service:
+            await shiori_service.close()
+        if checkpoint:
+            checkpoint.close()
 
 def main():
     """Point d'entrée principal du script."""
     parser = argparse.ArgumentParser(description="Importer l'historique des messages Discord vers Shiori")
     parser.add_argument("-d", "--days", type=int, help="Nombre de jours dans le passé à partir duquel récupérer les messages")
     parser.add_argument("-l", "--limit", type=int, help="Nombre maximum de messages à récupérer")
-    parser.add_argument("-b", "--batch-size", type=int, default=10, help="Nombre d'URLs à traiter par lot (défaut: 10)")
-    parser.add_argument("-r", "--request-delay", type=float, default=0.5, help="Délai entre chaque requête en secondes (défaut: 0.5)")
-    parser.add_argument("-bd", "--batch-delay", type=float, default=5, help="Délai entre les lots en secondes (défaut: 5)")
+    parser.add_argument("-c", "--concurrency", type=int, help=f"Nombre de requêtes simultanées vers Shiori (défaut: {CONCURRENCY})")
+    parser.add_argument("--rate", type=float, help=f"Débit maximum vers Shiori en requêtes par seconde, 0 = illimité (défaut: {RATE})")
+    parser.add_argument("-w", "--windows", type=int, help=f"Nombre de fenêtres de temps parcourues en parallèle dans l'historique (défaut: {WINDOWS})")
     parser.add_argument("--reverse", action="store_true", help="Inverser l'ordre d'importation (du plus ancien au plus récent)")
+    parser.add_argument("--resume", action="store_true", help="Reprendre un import interrompu à partir du point de reprise (implique --reverse)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help=f"Fichier du point de reprise (défaut: {CHECKPOINT_FILE})")
+    parser.add_argument("--bulk", action="store_true", help="Mode par lots: créer les bookmarks sans archive, puis les archiver par lots")
+    parser.add_argument("--archive-only", action="store_true", help="Archiver seulement les bookmarks créés par un import --bulk (reprise de l'archivage)")
+    parser.add_argument("--archive-batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help=f"Nombre de bookmarks archivés par requête (défaut: {ARCHIVE_BATCH_SIZE})")
+    parser.add_argument("--archive-delay", type=float, default=ARCHIVE_DELAY, help=f"Pause entre deux lots d'archivage en secondes (défaut: {ARCHIVE_DELAY})")
     parser.add_argument("--dry-run", action="store_true", help="Mode simulation: afficher les URLs sans les envoyer à Shiori")
+    parser.add_argument("--plan", help="En simulation, exporter le plan d'importation dans ce fichier (.csv ou .jsonl)")
+    parser.add_argument("--from-plan", help="Importer les URLs d'un plan exporté par --dry-run --plan, sans relire Discord")
+    parser.add_argument("--estimated-latency", type=float, default=ESTIMATED_LATENCY, help=f"Durée estimée d'un enregistrement dans Shiori pour le plan, en secondes (défaut: {ESTIMATED_LATENCY})")
     parser.add_argument("-v", "--verbose", action="store_true", help="Mode verbeux: afficher plus de détails")
     
     args = parser.parse_args()
+    if args.from_plan and (args.dry_run or DRY_RUN):
+        parser.error("--from-plan importe un plan déjà calculé: il n'est pas compatible avec --dry-run")
+    if args.plan and not (args.dry_run or DRY_RUN):
+        parser.error("--plan exporte le plan d'une simulation: il nécessite --dry-run")
     
     # Vérifier si les arguments ont été spécifiés, pas leurs valeurs
     # argparse définit les arguments non spécifiés avec leurs valeurs par défaut
@@ -228,36 +528,40 @@ def main():
     # Ces vérifications utilisent des valeurs par défaut personnalisées si l'argument n'est pas spécifié
     days = args.days if args.days is not None else DAYS
     limit = args.limit if args.limit is not None else LIMIT
-    reverse_order = args.reverse or REVERSE_ORDER
+    resume = args.resume
+    # La position de reprise n'a de sens que du plus ancien au plus récent
+    reverse_order = args.reverse or REVERSE_ORDER or resume
     dry_run = args.dry_run or DRY_RUN
     verbose = args.verbose or VERBOSE
     
     # Pour ces paramètres, nous devrions aussi vérifier si l'argument a été fourni
     # et non pas comparer avec une valeur spécifique
-    batch_size = BATCH_SIZE
-    if hasattr(args, 'batch_size') and args.batch_size is not None:
-        batch_size = args.batch_size
-        
-    request_delay = REQUEST_DELAY
-    if hasattr(args, 'request_delay') and args.request_delay is not None:
-        request_delay = args.request_delay
+    concurrency = CONCURRENCY
+    if hasattr(args, 'concurrency') and args.concurrency is not None:
+        concurrency = max(1, args.concurrency)
         
-    batch_delay = BATCH_DELAY
-    if hasattr(args, 'batch_delay') and args.batch_delay is not None:
-        batch_delay = args.batch_delay
+    rate = RATE
+    if hasattr(args, 'rate') and args.rate is not None:
+        rate = args.rate
+    
+    windows = max(1, args.windows if args.windows is not None else WINDOWS)
     
-    # Configuration du niveau de logging
+    # Configuration du niveau de logging (seulement celui de l'import, pas des autres sous-systèmes)
     if verbose:
         logger.setLevel(logging.DEBUG)
     
     try:
-        asyncio.run(import_history(days=days, limit=limit, batch_size=batch_size, 
-                                  request_delay=request_delay, batch_delay=batch_delay,
-                                  reverse_order=reverse_order, dry_run=dry_run))
+        asyncio.run(import_history(days=days, limit=limit, concurrency=concurrency,
+                                  rate=rate, reverse_order=reverse_order, dry_run=dry_run,
+                                  resume=resume, windows=windows, checkpoint_file=args.checkpoint,
+                                  bulk=args.bulk, archive_only=args.archive_only,
+                                  archive_batch_size=max(1, args.archive_batch_size),
+                                  archive_delay=args.archive_delay, plan_file=args.plan,
+                                  from_plan=args.from_plan, estimated_latency=args.estimated_latency))
     except KeyboardInterrupt:
         logger.info("Opération interrompue par l'utilisateur.")
     except Exception as e:
-        logger.error(f"Erreur lors de l'importation: {e}", exc_info=True)
+        logger.error("Erreur lors de l'importation: %s", e, exc_info=True)
         sys.exit(1)
 
 if __name__ == "__main__":
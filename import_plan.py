@@ -0,0 +1,113 @@
+import csv
+import json
+import logging
+from collections import Counter
+from urllib.parse import urlsplit
+
+from dedup import normalize_url
+
+logger = logging.getLogger('import-history')
+
+PLAN_FIELDS = ('message_id', 'url', 'excerpt', 'domain', 'status')
+
+
+def _domain(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def format_duration(seconds):
+    """Formate une durée en secondes sous la forme « 2h05 », « 12min » ou « 40s »."""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}"
+    if seconds >= 60:
+        return f"{seconds // 60}min"
+    return f"{seconds}s"
+
+
+class ImportPlan:
+    """Plan d'importation calculé lors d'une simulation (--dry-run).
+
+    Chaque URL trouvée reçoit un statut: `new` (à importer), `duplicate`
+    (déjà vue plus tôt dans le parcours) ou `in_shiori` (déjà présente dans
+    Shiori, d'après `existing`, un ensemble d'URLs normalisées). Le plan est
+    écrit au fil de l'eau dans `path` (CSV ou JSONL selon l'extension) pour
+    pouvoir être importé plus tard sans relire Discord (--from-plan).
+    """
+
+    def __init__(self, existing=None, path=None):
+        self.existing = existing or set()
+        self.path = path
+        self.seen = set()
+        self.counts = Counter()
+        self.domains = Counter()
+        self._file = None
+        self._writer = None
+        if path:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            if not path.endswith('.jsonl'):
+                self._writer = csv.DictWriter(self._file, fieldnames=PLAN_FIELDS)
+                self._writer.writeheader()
+
+    def add(self, record):
+        """Classe une URL trouvée dans l'historique et l'écrit dans le plan."""
+        key = normalize_url(record['url'])
+        if key in self.seen:
+            status = 'duplicate'
+        elif key in self.existing:
+            status = 'in_shiori'
+        else:
+            status = 'new'
+        self.seen.add(key)
+        self.counts[status] += 1
+        domain = _domain(record['url'])
+        if status == 'new':
+            self.domains[domain] += 1
+
+        if self._file:
+            row = {'message_id': record['message_id'], 'url': record['url'], 'excerpt': record['excerpt'],
+                   'domain': domain, 'status': status}
+            if self._writer:
+                self._writer.writerow(row)
+            else:
+                self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return status
+
+    def estimate_duration(self, concurrency, rate=0, latency=3.0):
+        """Estime la durée d'importation des nouvelles URLs (en secondes)."""
+        count = self.counts['new']
+        duration = count * latency / max(1, concurrency)
+        if rate:
+            duration = max(duration, count / rate)
+        return duration
+
+    def log_summary(self, messages, concurrency, rate=0, latency=3.0, top=10):
+        """Journalise le résumé du plan."""
+        total = sum(self.counts.values())
+        logger.info("Plan d'importation: %s messages, %s URLs dont %s uniques (%s doublons), "
+                    "%s déjà dans Shiori, %s à importer",
+                    messages, total, total - self.counts['duplicate'], self.counts['duplicate'],
+                    self.counts['in_shiori'], self.counts['new'])
+        if self.domains:
+            logger.info("URLs à importer par domaine: %s",
+                        ', '.join(f"{domain} {count}" for domain, count in self.domains.most_common(top)))
+        logger.info("Durée estimée de l'importation: %s (%s requêtes simultanées, %.1fs par bookmark, débit %s)",
+                    format_duration(self.estimate_duration(concurrency, rate, latency)),
+                    concurrency, latency, f"{rate} req/s" if rate else "illimité")
+        if self.path:
+            logger.info("Plan exporté dans %s (importer avec --from-plan %s)", self.path, self.path)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def read_plan(path):
+    """Lit un plan exporté et produit les URLs à importer (statut `new`)."""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = (json.loads(line) for line in f if line.strip()) if path.endswith('.jsonl') else csv.DictReader(f)
+        for row in rows:
+            if row.get('status', 'new') == 'new':
+                yield {'message_id': int(row['message_id']), 'url': row['url'], 'excerpt': row.get('excerpt') or ''}
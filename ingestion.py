@@ -0,0 +1,109 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger('discord-shiori-bot.ingestion')
+
+
+class IngestionQueue:
+    """File d'ingestion bornée vidée par un pool de workers en arrière-plan.
+
+    `handler` est une coroutine appelée pour chaque élément; elle retourne
+    True si l'élément a été traité avec succès. Quand la file est pleine,
+    `put` attend qu'une place se libère (contre-pression) et le temps
+    d'attente est comptabilisé dans les statistiques.
+    """
+
+    def __init__(self, handler, workers=2, maxsize=1000):
+        self.handler = handler
+        self.worker_count = workers
+        self.maxsize = maxsize
+        self.queue = None
+        self.workers = []
+        self.in_flight = []  # Éléments en cours de traitement par les workers
+        self.accepting = True
+        self.stats = {
+            'enqueued': 0,
+            'processed': 0,
+            'failed': 0,
+            'max_depth': 0,
+            'full_waits': 0,        # Nombre de mises en file bloquées par une file pleine
+            'full_wait_time': 0.0,  # Temps total passé à attendre une place (secondes)
+        }
+
+    async def start(self):
+        """Démarre les workers (sans effet s'ils tournent déjà)."""
+        if self.queue is None:
+            # La file est créée ici pour être liée à la boucle asyncio en cours
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self.workers = [task for task in self.workers if not task.done()]
+        while len(self.workers) < self.worker_count:
+            self.workers.append(asyncio.create_task(self._worker()))
+        logger.info("File d'ingestion démarrée (%s workers, capacité %s)", self.worker_count, self.maxsize)
+
+    def depth(self):
+        """Nombre d'éléments en attente dans la file."""
+        return self.queue.qsize() if self.queue else 0
+
+    async def put(self, item):
+        """Ajoute un élément à la file, en attendant si elle est pleine."""
+        if not self.accepting:
+            logger.warning("File d'ingestion fermée, élément refusé: %s (entrée %s)", item['url'], item.get('id'))
+            return False
+        if self.queue is None:
+            await self.start()
+
+        if self.queue.full():
+            self.stats['full_waits'] += 1
+            logger.warning("File d'ingestion pleine (%s éléments), attente d'une place...", self.maxsize)
+            started = time.monotonic()
+            await self.queue.put(item)
+            self.stats['full_wait_time'] += time.monotonic() - started
+        else:
+            self.queue.put_nowait(item)
+
+        self.stats['enqueued'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], self.queue.qsize())
+        return True
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            self.in_flight.append(item)
+            try:
+                if await self.handler(item):
+                    self.stats['processed'] += 1
+                else:
+                    self.stats['failed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error("Erreur lors du traitement de %s (entrée %s): %s", item['url'], item.get('id'), e,
+                             exc_info=True)
+            finally:
+                self.in_flight.remove(item)
+                self.queue.task_done()
+
+    async def drain(self, timeout=None):
+        """Refuse les nouveaux éléments, attend la fin de ceux en file puis arrête les workers.
+
+        Retourne les éléments qui n'ont pas pu être traités avant `timeout`.
+        """
+        self.accepting = False
+        remaining = []
+        if self.queue is not None:
+            logger.info("Vidage de la file d'ingestion (%s éléments en attente)...", self.depth())
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                remaining.extend(self.in_flight)
+                while not self.queue.empty():
+                    remaining.append(self.queue.get_nowait())
+                    self.queue.task_done()
+                logger.warning("Délai de vidage dépassé, %s éléments non traités", len(remaining))
+
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logger.info("File d'ingestion arrêtée: %s", self.stats)
+        return remaining
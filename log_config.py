@@ -0,0 +1,127 @@
+import os
+import copy
+import json
+import queue
+import atexit
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Noms courts des sous-systèmes utilisables dans LOG_LEVELS
+SUBSYSTEMS = {
+    'bot': 'discord-shiori-bot',
+    'import': 'import-history',
+    'shiori': 'discord-shiori-bot.shiori',
+    'ingestion': 'discord-shiori-bot.ingestion',
+    'outbox': 'discord-shiori-bot.outbox',
+    'enrichment': 'discord-shiori-bot.enrichment',
+    'metrics': 'discord-shiori-bot.metrics',
+    'routing': 'discord-shiori-bot.routing',
+    'discord': 'discord',
+}
+
+# Attributs standard d'un LogRecord: tout le reste vient de `extra` et est exporté tel quel
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formate chaque enregistrement en une ligne JSON (champs `extra` compris)."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    """QueueHandler qui ne formate pas l'enregistrement sur le thread appelant.
+
+    Seul le message est fusionné avec ses arguments (getMessage()); les
+    informations d'exception sont conservées pour que le formateur du thread
+    d'arrière-plan produise la trace complète.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class Redacted:
+    """Contenu de message tronqué (ou masqué) à l'affichage seulement.
+
+    Le texte n'est découpé que si l'enregistrement est réellement émis.
+    Avec une longueur nulle, seule la taille du contenu est journalisée.
+    """
+
+    __slots__ = ('text', 'length')
+
+    def __init__(self, text, length=None):
+        self.text = text or ''
+        self.length = int(os.getenv('LOG_CONTENT_LENGTH', 80)) if length is None else length
+
+    def __str__(self):
+        if not self.length:
+            return f"<{len(self.text)} caractères>"
+        if len(self.text) <= self.length:
+            return self.text
+        return self.text[:self.length] + '…'
+
+
+def parse_levels(spec):
+    """Analyse LOG_LEVELS ("shiori=DEBUG,discord=WARNING") en {nom du logger: niveau}."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, level = (part.strip() for part in item.split('=', 1))
+        levels[SUBSYSTEMS.get(name, name)] = level.upper()
+    return levels
+
+
+def setup_logging(level=None, fmt=None, levels=None):
+    """Configure le logging: émission non bloquante via une file, en texte ou en JSON.
+
+    Les appels de log fusionnent seulement le message avec ses arguments et
+    mettent l'enregistrement en file; le formatage (horodatage, trace des
+    exceptions, JSON) et l'écriture sont faits par un thread d'arrière-plan
+    (QueueListener). `level` est le
+    niveau par défaut (LOG_LEVEL), `fmt` le format `text` ou `json`
+    (LOG_FORMAT) et `levels` les niveaux par sous-système (LOG_LEVELS).
+    Retourne le QueueListener, arrêté automatiquement à la sortie.
+    """
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    fmt = fmt or os.getenv('LOG_FORMAT', 'text')
+    levels = parse_levels(os.getenv('LOG_LEVELS')) if levels is None else levels
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(RecordQueueHandler(log_queue))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    for name, subsystem_level in levels.items():
+        logging.getLogger(name).setLevel(subsystem_level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,185 @@
+import json
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger('discord-shiori-bot.metrics')
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Compteur croissant, éventuellement ventilé par labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name + _format_labels(self.labelnames, key), value
+
+    def snapshot(self):
+        return {','.join(key) or 'total': value for key, value in self.values.items()}
+
+
+class Gauge:
+    """Valeur instantanée, fixée directement ou lue via une fonction à chaque export."""
+
+    type = 'gauge'
+
+    def __init__(self, name, description, function=None):
+        self.name = name
+        self.description = description
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+    def samples(self):
+        yield self.name, self.get()
+
+    def snapshot(self):
+        return self.get()
+
+
+class Histogram:
+    """Distribution de valeurs (latences...) par tranches cumulatives."""
+
+    type = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # clé -> [compteurs par tranche, somme, nombre]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        if key not in self.values:
+            self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        entry = self.values[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mesure la durée du bloc `with` en secondes."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def samples(self):
+        for key, (counts, total, count) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield self.name + '_bucket' + _format_labels(self.labelnames, key, ('le', bound)), bucket_count
+            yield self.name + '_bucket' + _format_labels(self.labelnames, key, ('le', '+Inf')), count
+            yield self.name + '_sum' + _format_labels(self.labelnames, key), total
+            yield self.name + '_count' + _format_labels(self.labelnames, key), count
+
+    def snapshot(self):
+        return {','.join(key) or 'total': {'count': count, 'sum': round(total, 3),
+                                           'avg': round(total / count, 3) if count else 0}
+                for key, (counts, total, count) in self.values.items()}
+
+
+class Registry:
+    """Ensemble des métriques exportées."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Exporte les métriques au format texte de Prometheus."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Retourne un instantané des métriques sous forme de dictionnaire."""
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+SHIORI_LATENCY = REGISTRY.register(Histogram(
+    'shiori_request_duration_seconds', "Durée des requêtes vers Shiori", ('operation',)))
+SHIORI_REQUESTS = REGISTRY.register(Counter(
+    'shiori_requests_total', "Requêtes vers Shiori par résultat (success, 4xx, 5xx, timeout, error)",
+    ('operation', 'outcome')))
+SHIORI_RETRIES = REGISTRY.register(Counter(
+    'shiori_retries_total', "Nouvelles tentatives de requêtes vers Shiori", ('operation',)))
+URLS_PER_MESSAGE = REGISTRY.register(Histogram(
+    'urls_extracted_per_message', "Nombre d'URLs extraites par message", buckets=(0, 1, 2, 3, 5, 10)))
+
+
+def status_outcome(status):
+    """Classe un code HTTP dans un résultat de métrique."""
+    if 200 <= status < 300:
+        return 'success'
+    if 400 <= status < 500:
+        return '4xx'
+    if status >= 500:
+        return '5xx'
+    return 'error'
+
+
+async def start_metrics_server(port, host='0.0.0.0'):
+    """Démarre un serveur HTTP local exposant les métriques sur /metrics."""
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=REGISTRY.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Métriques exposées sur http://%s:%s/metrics", host, port)
+    return runner
+
+
+async def log_snapshots(interval):
+    """Journalise périodiquement un instantané JSON des métriques."""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Métriques: %s", json.dumps(REGISTRY.snapshot(), ensure_ascii=False))
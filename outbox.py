@@ -0,0 +1,172 @@
+import time
+import random
+import sqlite3
+import asyncio
+import logging
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger('discord-shiori-bot.outbox')
+
+
+class Outbox:
+    """Boîte d'envoi persistante (SQLite en mode WAL) des URLs à enregistrer.
+
+    Une URL y est écrite avant toute tentative d'envoi et n'en est supprimée
+    qu'une fois acceptée par Shiori. En cas d'échec, la tentative suivante
+    est planifiée avec un délai exponentiel et une part d'aléatoire.
+    Les entrées en cours d'envoi sont « réservées » en mémoire pour ne pas
+    être envoyées deux fois en parallèle. L'outbox conserve aussi, par canal,
+    l'id du dernier message traité, pour rattraper les messages postés
+    pendant une interruption du bot.
+    """
+
+    def __init__(self, path, base_delay=30, max_delay=3600):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claimed = set()
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                description TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                channel_id INTEGER
+            )
+        """)
+        # Outbox créée avant le routage multi-canaux: ajouter la colonne du canal
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(outbox)")]
+        if 'channel_id' not in columns:
+            self.db.execute("ALTER TABLE outbox ADD COLUMN channel_id INTEGER")
+        self.db.execute("CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt_at)")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS position (
+                channel_id INTEGER PRIMARY KEY,
+                last_message_id INTEGER NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    def add(self, url, description="", channel_id=None):
+        """Enregistre une URL à envoyer et la réserve pour un envoi immédiat."""
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO outbox (url, description, next_attempt_at, created_at, channel_id) VALUES (?, ?, ?, ?, ?)",
+            (url, description, now, now, channel_id)
+        )
+        self.db.commit()
+        self.claimed.add(cursor.lastrowid)
+        return cursor.lastrowid
+
+    def due(self, limit=50):
+        """Réserve et retourne les entrées dont la prochaine tentative est échue."""
+        rows = self.db.execute(
+            "SELECT id, url, description, channel_id FROM outbox WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+            (time.time(), limit + len(self.claimed))
+        ).fetchall()
+        entries = []
+        for entry_id, url, description, channel_id in rows:
+            if entry_id in self.claimed:
+                continue
+            self.claimed.add(entry_id)
+            entries.append({'id': entry_id, 'url': url, 'description': description or '', 'channel_id': channel_id})
+            if len(entries) >= limit:
+                break
+        return entries
+
+    def delete(self, entry_id):
+        """Supprime une entrée acceptée par Shiori."""
+        self.db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+        self.db.commit()
+        self.claimed.discard(entry_id)
+
+    def reschedule(self, entry_id):
+        """Planifie une nouvelle tentative après un échec (backoff exponentiel + jitter)."""
+        row = self.db.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        if row is not None:
+            attempts = row[0] + 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            delay *= random.uniform(0.5, 1.5)
+            self.db.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, time.time() + delay, entry_id)
+            )
+            self.db.commit()
+            logger.info("Nouvelle tentative dans %.0fs (tentative %s) pour l'entrée %s", delay, attempts, entry_id)
+        self.claimed.discard(entry_id)
+
+    def last_message_id(self, channel_id):
+        """Retourne l'id du dernier message traité dans le canal (ou None)."""
+        row = self.db.execute(
+            "SELECT last_message_id FROM position WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_last_message_id(self, channel_id, message_id):
+        """Enregistre le dernier message traité dans le canal (la position ne recule jamais)."""
+        self.db.execute(
+            "INSERT INTO position (channel_id, last_message_id) VALUES (?, ?) "
+            "ON CONFLICT(channel_id) DO UPDATE SET last_message_id = MAX(last_message_id, excluded.last_message_id)",
+            (channel_id, message_id)
+        )
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class OutboxReplayer:
+    """Tâche de fond qui réinjecte par lots les entrées échues de l'outbox.
+
+    Les entrées sont transmises à `submit` (par exemple la file d'ingestion)
+    en respectant un débit maximum de `rate` entrées par seconde.
+    """
+
+    def __init__(self, outbox, submit, batch_size=50, rate=1.0, interval=30):
+        self.outbox = outbox
+        self.submit = submit
+        self.batch_size = batch_size
+        self.rate = rate
+        self.interval = interval
+        self.task = None
+
+    def start(self):
+        """Démarre la tâche de rejeu (sans effet si elle tourne déjà)."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+            logger.info("Rejeu de l'outbox démarré (%s entrées en attente)", len(self.outbox))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        bucket = TokenBucket(self.rate)
+        while True:
+            try:
+                entries = self.outbox.due(self.batch_size)
+                if entries:
+                    logger.info("Rejeu de %s entrées de l'outbox (%s en attente)", len(entries), len(self.outbox))
+                for entry in entries:
+                    await bucket.acquire()
+                    if not await self.submit(entry):
+                        # Entrée refusée (arrêt en cours): elle reste dans l'outbox
+                        self.outbox.claimed.discard(entry['id'])
+                # Lot complet: d'autres entrées sont probablement échues, on enchaîne
+                if len(entries) < self.batch_size:
+                    await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Erreur lors du rejeu de l'outbox: %s", e, exc_info=True)
+                await asyncio.sleep(self.interval)
@@ -0,0 +1,131 @@
+import time
+import asyncio
+from collections import deque
+
+
+class TokenBucket:
+    """Limiteur de débit à seau de jetons.
+
+    `rate` jetons sont ajoutés chaque seconde, jusqu'à `capacity` jetons
+    (rafale maximale). Un débit nul ou None désactive la limitation.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate or 0)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        # Le verrou est créé à la première utilisation pour être lié à la bonne boucle asyncio
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme."""
+        if not self.rate:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """Limite adaptative du nombre de requêtes simultanées (AIMD).
+
+    La limite augmente d'environ une requête par « fenêtre » tant que les
+    réponses sont rapides (sous `target_latency`) et réussies, et elle est
+    divisée par deux en cas d'erreur serveur, de timeout ou de latence trop
+    élevée. Seuls les échecs des requêtes envoyées après la dernière baisse
+    la provoquent, pour ne pas réagir plusieurs fois à la même rafale
+    d'erreurs sans pour autant laisser la hausse effacer la baisse. La limite
+    qui a provoqué la dernière baisse n'est retentée qu'après
+    `probe_interval` secondes: entre-temps, la limite se stabilise juste
+    en dessous, sous la capacité du serveur.
+    """
+
+    def __init__(self, initial=2, min_limit=1, max_limit=16, target_latency=10.0,
+                 decrease_factor=0.5, probe_interval=10.0, logger=None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.probe_interval = probe_interval
+        self.logger = logger
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.sent = 0  # Numéro de la dernière requête autorisée
+        self.recovery = 0  # Dernière requête envoyée avant la dernière baisse
+        self.ceiling = None  # Limite qui a provoqué la dernière baisse
+        self._waiters = deque()
+
+    @property
+    def current_limit(self):
+        return int(self.limit)
+
+    async def acquire(self):
+        """Attend qu'une place se libère sous la limite courante.
+
+        Retourne le numéro de la requête, à repasser à release().
+        """
+        while self.in_flight >= self.current_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Réveillé puis annulé: la place libérée revient à un autre appel
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        self.sent += 1
+        return self.sent
+
+    def _wake(self):
+        free = self.current_limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def release(self, latency, success, ticket=None):
+        """Libère une place et ajuste la limite selon le résultat de la requête.
+
+        `success` vaut True (réponse correcte), False (erreur serveur, timeout)
+        ou None (résultat neutre, par exemple un token expiré). `ticket` est
+        le numéro retourné par acquire() (None: requête considérée récente).
+        """
+        previous = self.current_limit
+        now = time.monotonic()
+        if success is False or (success and latency > self.target_latency):
+            # Une requête envoyée avant la dernière baisse a déjà été prise en compte
+            if ticket is None or ticket > self.recovery:
+                self.recovery = self.sent
+                self.ceiling = previous
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self.last_decrease = now
+        elif success:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if self.ceiling is not None and now - self.last_decrease < self.probe_interval:
+                self.limit = min(self.limit, max(self.min_limit, self.ceiling - 1))
+
+        if self.logger and self.current_limit != previous:
+            self.logger.info("Limite adaptative Shiori: %s requêtes simultanées (latence %.2fs, %s)",
+                             self.current_limit, latency, 'succès' if success else 'échec')
+
+        self.in_flight -= 1
+        self._wake()
@@ -0,0 +1,72 @@
+import os
+import json
+import logging
+
+from shiori_service import ShioriService
+
+logger = logging.getLogger('discord-shiori-bot.routing')
+
+
+def load_routes(path=None, default_channel_id=0):
+    """Construit la table de routage canal Discord -> cible Shiori.
+
+    Avec un fichier de configuration JSON, chaque canal est associé à une
+    cible Shiori (URL, identifiants) et à des tags; les canaux qui partagent
+    une cible partagent aussi son client (session HTTP, token, limites).
+    Sans fichier, seul `default_channel_id` est routé vers la cible définie
+    par les variables SHIORI_*.
+
+    Format du fichier:
+
+        {
+          "targets": {
+            "perso": {"api_url": "http://nas:8080/api/v1", "username": "moi",
+                      "password_env": "SHIORI_PASSWORD_PERSO", "tags": ["discord"]}
+          },
+          "channels": {
+            "123456789012345678": {"target": "perso", "tags": ["veille"]}
+          }
+        }
+
+    Retourne (routes, services): `routes` associe l'id du canal à un
+    dictionnaire {'name', 'service', 'tags'}; `services` liste les clients.
+    """
+    if not path:
+        service = ShioriService()
+        routes = {default_channel_id: {'name': 'default', 'service': service, 'tags': []}} if default_channel_id else {}
+        return routes, [service]
+
+    with open(path) as f:
+        config = json.load(f)
+
+    services = {}
+    target_tags = {}
+    for name, target in config.get('targets', {}).items():
+        password = target.get('password')
+        if password is None and target.get('password_env'):
+            password = os.getenv(target['password_env'])
+        # Une cible avec sa propre URL ne reçoit jamais les identifiants SHIORI_* par défaut
+        if target.get('api_url') and (not target.get('username') or password is None):
+            raise ValueError(f"Identifiants manquants pour la cible Shiori '{name}' "
+                             "(username et password ou password_env)")
+        services[name] = ShioriService(
+            api_url=target.get('api_url'),
+            username=target.get('username'),
+            password=password,
+            name=name
+        )
+        target_tags[name] = list(target.get('tags', []))
+
+    routes = {}
+    for channel_id, channel in config.get('channels', {}).items():
+        target = channel.get('target')
+        if target not in services:
+            raise ValueError(f"Cible Shiori inconnue '{target}' pour le canal {channel_id}")
+        routes[int(channel_id)] = {
+            'name': target,
+            'service': services[target],
+            'tags': target_tags[target] + [tag for tag in channel.get('tags', []) if tag not in target_tags[target]]
+        }
+
+    logger.info("Configuration chargée: %s canaux vers %s cibles Shiori", len(routes), len(services))
+    return routes, list(services.values())
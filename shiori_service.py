@@ -1,24 +1,50 @@
 import os
+import json
+import base64
 import logging
 import aiohttp
 import time
 import asyncio
+from datetime import datetime
 from dotenv import load_dotenv
+from dedup import SeenUrls, normalize_url
+from rate_limit import AdaptiveLimiter
+from metrics import SHIORI_LATENCY, SHIORI_REQUESTS, SHIORI_RETRIES, status_outcome
 
 # Configuration du logging
-logger = logging.getLogger('discord-shiori-bot')
+logger = logging.getLogger('discord-shiori-bot.shiori')
 
 # Charger les variables d'environnement
 load_dotenv()
 
+def _target_file(path, name):
+    """Suffixe un nom de fichier par le nom de la cible (seen_urls.db -> seen_urls.perso.db)."""
+    if not path or not name:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
 class ShioriService:
-    def __init__(self):
-        self.api_base_url = os.getenv('SHIORI_API_URL').rstrip('/')
-        self.username = os.getenv('SHIORI_USERNAME')
-        self.password = os.getenv('SHIORI_PASSWORD')
+    def __init__(self, api_url=None, username=None, password=None, name=None, persist=True):
+        """Client d'une instance Shiori.
+
+        Sans paramètres, la cible est définie par les variables SHIORI_*. Avec
+        `api_url`, les identifiants doivent être fournis: ceux des variables
+        SHIORI_* ne sont pas envoyés à une autre instance. `name`
+        distingue les fichiers (token, index des doublons) de plusieurs cibles.
+        Avec `persist=False`, aucun fichier n'est créé: l'index des doublons
+        reste en mémoire et le token n'est ni relu ni conservé.
+        """
+        self.name = name
+        self.api_base_url = (api_url or os.getenv('SHIORI_API_URL')).rstrip('/')
+        self.username = username if api_url else username or os.getenv('SHIORI_USERNAME')
+        self.password = password if api_url or password is not None else os.getenv('SHIORI_PASSWORD')
         self.token = None
-        self.token_timestamp = 0
-        self.token_expiry = 3600  # Durée de validité du token en secondes (par défaut 1h)
+        self.token_expires_at = 0  # Date d'expiration du token (timestamp)
+        self.token_expiry = 3600  # Durée de validité par défaut si le serveur ne l'indique pas (1h)
+        self.token_refresh_margin = float(os.getenv('SHIORI_TOKEN_REFRESH_MARGIN', 60))  # Renouvellement anticipé (secondes)
+        self.token_file = _target_file(os.getenv('SHIORI_TOKEN_FILE', '.shiori_token.json'), name) if persist else None  # Vide pour ne pas conserver le token
+        self._auth_lock = None  # Créé à la première utilisation pour être lié à la bonne boucle asyncio
         
         # URL sans /api/v1 pour les endpoints d'API
         self.api_endpoint = self.api_base_url.replace('/api/v1', '')
@@ -27,29 +53,181 @@ class ShioriService:
         self.max_retries = 3
         self.retry_delay = 2  # secondes
         
-    async def authenticate(self, force=False):
-        """Authentification auprès de l'API Shiori."""
+        # Configuration du pool de connexions HTTP (réutilisé entre les requêtes)
+        self.pool_limit = int(os.getenv('SHIORI_POOL_LIMIT', 10))  # Connexions simultanées max
+        self.pool_limit_per_host = int(os.getenv('SHIORI_POOL_LIMIT_PER_HOST', 10))  # Connexions max par hôte
+        self.keepalive_timeout = float(os.getenv('SHIORI_KEEPALIVE_TIMEOUT', 60))  # secondes
+        self.dns_cache_ttl = int(os.getenv('SHIORI_DNS_CACHE_TTL', 300))  # secondes
+        self.session = None
+        
+        # Limite adaptative des requêtes simultanées d'enregistrement (AIMD)
+        self.limiter = AdaptiveLimiter(
+            initial=int(os.getenv('SHIORI_ADAPTIVE_INITIAL', 2)),
+            min_limit=int(os.getenv('SHIORI_ADAPTIVE_MIN', 1)),
+            max_limit=int(os.getenv('SHIORI_ADAPTIVE_MAX', 8)),
+            target_latency=float(os.getenv('SHIORI_TARGET_LATENCY', 10)),  # secondes
+            logger=logger
+        )
+        
+        # Détection des doublons: URLs déjà enregistrées (cache LRU + index SQLite)
+        self.seen_urls = SeenUrls(
+            _target_file(os.getenv('SHIORI_DEDUP_FILE', 'seen_urls.db'), name) if persist else None,
+            cache_size=int(os.getenv('SHIORI_DEDUP_CACHE_SIZE', 10000))
+        )
+        self.dedup_warm = os.getenv('SHIORI_DEDUP_WARM', '0') == '1'  # Charger les bookmarks existants au démarrage
+        self.in_flight_urls = set()  # URLs normalisées en cours d'enregistrement
+        
+        # Enrichissement optionnel des bookmarks (titre, description, tags) avant l'envoi (voir enrichment.py)
+        self.enricher = None
+        
+        # Reprendre le token d'une exécution précédente pour éviter une connexion au démarrage
+        self._load_token()
+        
+    async def start(self):
+        """Ouvre la session HTTP partagée (keep-alive) si elle n'existe pas déjà."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+            logger.info("Session HTTP Shiori ouverte (limite: %s, par hôte: %s)",
+                        self.pool_limit, self.pool_limit_per_host)
+        return self.session
+    
+    async def close(self):
+        """Ferme la session HTTP partagée et libère les connexions du pool."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            logger.info("Session HTTP Shiori fermée")
+        self.session = None
+        # L'enrichisseur ouvre sa propre session à la première page téléchargée
+        if self.enricher:
+            await self.enricher.close()
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        
+    def _token_valid(self):
+        """Indique si le token courant est utilisable (hors marge de renouvellement)."""
+        return bool(self.token) and time.time() < self.token_expires_at - self.token_refresh_margin
+    
+    def _load_token(self):
+        """Charge le token conservé sur disque s'il correspond à ce compte et n'a pas expiré."""
+        if not self.token_file or not os.path.exists(self.token_file):
+            return False
+        try:
+            with open(self.token_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Impossible de lire le token conservé: %s", e)
+            return False
+        
+        if saved.get('api_url') != self.api_base_url or saved.get('username') != self.username:
+            return False
+        self.token = saved.get('token')
+        self.token_expires_at = saved.get('expires_at', 0)
+        if self._token_valid():
+            logger.info("Token Shiori conservé réutilisé")
+            return True
+        self.token = None
+        return False
+    
+    def _save_token(self):
+        """Conserve le token sur disque (lisible uniquement par l'utilisateur courant)."""
+        if not self.token_file:
+            return
+        try:
+            fd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'api_url': self.api_base_url,
+                    'username': self.username,
+                    'token': self.token,
+                    'expires_at': self.token_expires_at
+                }, f)
+        except OSError as e:
+            logger.warning("Impossible de conserver le token: %s", e)
+    
+    def _parse_expiry(self, data, token, now):
+        """Détermine la date d'expiration du token à partir de la réponse de connexion.
+
+        Utilise le champ `expires` (timestamp, durée ou date ISO) s'il est présent,
+        puis la revendication `exp` si le token est un JWT, et à défaut la durée
+        de validité par défaut.
+        """
+        candidates = [data.get('expires')]
+        if isinstance(data.get('message'), dict):
+            candidates.append(data['message'].get('expires'))
+        
+        for value in candidates:
+            if isinstance(value, (int, float)) and value > 0:
+                # Un grand nombre est un timestamp, un petit une durée en secondes
+                return float(value) if value > 1e9 else now + value
+            if isinstance(value, str):
+                try:
+                    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+                except ValueError:
+                    pass
+        
+        parts = token.split('.') if isinstance(token, str) else []
+        if len(parts) == 3:
+            try:
+                payload = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+                if isinstance(payload.get('exp'), (int, float)):
+                    return float(payload['exp'])
+            except (ValueError, TypeError):
+                pass
+        
+        return now + self.token_expiry
+        
+    async def authenticate(self, force=False, stale_token=None):
+        """Authentification auprès de l'API Shiori.
+
+        Les appels concurrents partagent une seule connexion en cours. Avec
+        `force=True`, `stale_token` indique le token refusé par le serveur: s'il
+        a déjà été remplacé entre-temps, aucune nouvelle connexion n'est faite.
+        """
         # Vérifie si le token est encore valide (sauf si force=True)
-        current_time = time.time()
-        if not force and self.token and (current_time - self.token_timestamp) < self.token_expiry:
+        if not force and self._token_valid():
             return self.token
-            
+        
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        async with self._auth_lock:
+            # Un autre appel a pu renouveler le token pendant l'attente du verrou
+            if self._token_valid() and (not force or (stale_token is not None and self.token != stale_token)):
+                return self.token
+            return await self._login()
+    
+    async def _login(self):
+        """Se connecte à l'API Shiori et conserve le nouveau token."""
         auth_url = f"{self.api_base_url}/auth/login"
-        logger.info(f"Tentative d'authentification à Shiori: {auth_url}")
+        logger.info("Tentative d'authentification à Shiori: %s", auth_url)
         
         retry_count = 0
         while retry_count < self.max_retries:
             try:
-                async with aiohttp.ClientSession() as session:
-                    resp = await session.post(
-                        auth_url,
-                        json={
-                            "username": self.username,
-                            "password": self.password,
-                            "remember": True
-                        },
-                        timeout=30  # Timeout explicite
-                    )
+                session = await self.start()
+                started = time.monotonic()
+                async with session.post(
+                    auth_url,
+                    json={
+                        "username": self.username,
+                        "password": self.password,
+                        "remember": True
+                    },
+                    timeout=30  # Timeout explicite
+                ) as resp:
+                    SHIORI_LATENCY.observe(time.monotonic() - started, operation='authenticate')
+                    SHIORI_REQUESTS.inc(operation='authenticate', outcome=status_outcome(resp.status))
                     
                     if resp.status == 200:
                         data = await resp.json()
@@ -62,41 +240,222 @@ class ShioriService:
                         elif isinstance(data, dict) and 'message' in data and 'token' in data['message']:
                             self.token = data['message']['token']
                         
-                        self.token_timestamp = current_time
-                        logger.info("Authentification réussie à Shiori")
+                        self.token_expires_at = self._parse_expiry(data, self.token, time.time())
+                        self._save_token()
+                        logger.info("Authentification réussie à Shiori (expiration: %s)",
+                                    datetime.fromtimestamp(self.token_expires_at).strftime('%Y-%m-%d %H:%M'))
                         return self.token
                     else:
                         body = await resp.text()
-                        logger.warning(f"Échec d'authentification (tentative {retry_count+1}/{self.max_retries}): {resp.status} - {body[:200]}")
+                        logger.warning("Échec d'authentification (tentative %s/%s): %s - %s",
+                                       retry_count+1, self.max_retries, resp.status, body[:200])
+                        SHIORI_RETRIES.inc(operation='authenticate')
                         retry_count += 1
                         await asyncio.sleep(self.retry_delay)
             except asyncio.TimeoutError:
-                logger.warning(f"Timeout lors de l'authentification (tentative {retry_count+1}/{self.max_retries})")
+                SHIORI_REQUESTS.inc(operation='authenticate', outcome='timeout')
+                logger.warning("Timeout lors de l'authentification (tentative %s/%s)", retry_count+1, self.max_retries)
+                SHIORI_RETRIES.inc(operation='authenticate')
                 retry_count += 1
                 await asyncio.sleep(self.retry_delay)
             except aiohttp.ClientError as e:
-                logger.warning(f"Erreur réseau lors de l'authentification (tentative {retry_count+1}/{self.max_retries}): {str(e)}")
+                SHIORI_REQUESTS.inc(operation='authenticate', outcome='error')
+                logger.warning("Erreur réseau lors de l'authentification (tentative %s/%s): %s",
+                               retry_count+1, self.max_retries, e)
+                SHIORI_RETRIES.inc(operation='authenticate')
                 retry_count += 1
                 await asyncio.sleep(self.retry_delay)
             except Exception as e:
-                logger.error(f"Erreur inattendue lors de l'authentification: {str(e)}")
+                logger.error("Erreur inattendue lors de l'authentification: %s", e)
                 raise
                 
         raise Exception(f"Échec d'authentification après {self.max_retries} tentatives")
     
-    async def save_bookmark(self, url, description=""):
-        """Enregistre une URL dans Shiori."""
+    async def fetch_bookmark_urls(self):
+        """Parcourt page par page les bookmarks existants dans Shiori et produit leurs URLs."""
+        bookmarks_url = f"{self.api_endpoint}/api/bookmarks"
+        page = 1
+        while True:
+            token = await self.authenticate()
+            session = await self.start()
+            async with session.get(
+                bookmarks_url,
+                params={"page": page},
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=60
+            ) as resp:
+                if resp.status != 200:
+                    body = await resp.text()
+                    logger.warning("Impossible de lister les bookmarks (page %s): %s - %s",
+                                   page, resp.status, body[:200])
+                    return
+                data = await resp.json()
+            
+            bookmarks = data.get('bookmarks') or []
+            for bookmark in bookmarks:
+                if bookmark.get('url'):
+                    yield bookmark['url']
+            
+            if not bookmarks or page >= (data.get('maxPage') or 1):
+                return
+            page += 1
+    
+    async def warm_seen_urls(self):
+        """Précharge l'index des doublons avec les bookmarks déjà présents dans Shiori."""
+        logger.info("Chargement des bookmarks existants pour la détection des doublons...")
+        count = 0
+        batch = []
+        try:
+            async for url in self.fetch_bookmark_urls():
+                batch.append(url)
+                if len(batch) >= 500:
+                    self.seen_urls.add_many(batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.seen_urls.add_many(batch)
+                count += len(batch)
+            logger.info("%s bookmarks existants chargés dans l'index des doublons", count)
+        except Exception as e:
+            logger.warning("Échec du chargement des bookmarks existants (%s chargés): %s", count, e)
+        return count
+    
+    async def save_bookmark(self, url, description="", tags=None, create_archive=True):
+        """Enregistre une URL dans Shiori (les doublons sont ignorés sans appel réseau)."""
+        return await self.create_bookmark(url, description, tags, create_archive) is not None
+    
+    async def create_bookmark(self, url, description="", tags=None, create_archive=True):
+        """Enregistre une URL dans Shiori et retourne le bookmark créé.
+
+        Retourne le bookmark renvoyé par Shiori (dictionnaire avec son `id`), un
+        dictionnaire vide pour un doublon ignoré, ou None en cas d'échec. La clé
+        `archive` du bookmark créé indique si une archive est voulue pour cette
+        URL (False si une règle d'enrichissement désactive l'archivage).
+        """
+        url_key = normalize_url(url)
+        if url_key in self.in_flight_urls or url in self.seen_urls:
+            logger.info("URL déjà enregistrée dans Shiori, ignorée: %s", url)
+            return {}
+        
+        self.in_flight_urls.add(url_key)
+        try:
+            title = None
+            archive = True
+            if self.enricher:
+                # Métadonnées de la page: Shiori reçoit un bookmark complet
+                page = await self.enricher.enrich(url)
+                title = page['title']
+                description = page['description'] or description
+                tags = list(tags or []) + [tag for tag in page['tags'] if tag not in (tags or [])]
+                archive = page['archive']
+                create_archive = create_archive and archive
+            bookmark = await self._save_bookmark(url, description, tags, create_archive, title)
+        finally:
+            self.in_flight_urls.discard(url_key)
+        
+        if bookmark is not None:
+            self.seen_urls.add(url)
+            bookmark = dict(bookmark, archive=archive)
+        return bookmark
+    
+    async def archive_bookmarks(self, ids):
+        """Demande à Shiori de créer l'archive d'un lot de bookmarks existants."""
+        cache_url = f"{self.api_endpoint}/api/cache"
+        retry_count = 0
+        
+        while retry_count < self.max_retries:
+            try:
+                token = await self.authenticate()
+                session = await self.start()
+                started = time.monotonic()
+                async with session.put(
+                    cache_url,
+                    json={"ids": ids, "createArchive": True, "keepMetadata": True},
+                    headers={"Authorization": f"Bearer {token}"},
+                    timeout=max(60, 30 * len(ids))  # Shiori télécharge chaque page du lot
+                ) as resp:
+                    status = resp.status
+                    body = await resp.text()
+                SHIORI_LATENCY.observe(time.monotonic() - started, operation='archive')
+                SHIORI_REQUESTS.inc(operation='archive', outcome=status_outcome(status))
+                
+                if status in (401, 403):
+                    logger.info("Token expiré, nouvelle authentification...")
+                    await self.authenticate(force=True, stale_token=token)
+                elif 500 <= status < 600:
+                    logger.warning("Erreur serveur %s lors de l'archivage, nouvelle tentative %s/%s",
+                                   status, retry_count+1, self.max_retries)
+                    await asyncio.sleep(self.retry_delay)
+                elif 200 <= status < 300:
+                    logger.info("Archivage de %s bookmarks terminé", len(ids))
+                    return True
+                else:
+                    logger.error("Échec de l'archivage: %s - %s", status, body[:200])
+                    return False
+            except asyncio.TimeoutError:
+                SHIORI_REQUESTS.inc(operation='archive', outcome='timeout')
+                logger.warning("Timeout lors de l'archivage (tentative %s/%s)", retry_count+1, self.max_retries)
+                await asyncio.sleep(self.retry_delay)
+            except aiohttp.ClientError as e:
+                SHIORI_REQUESTS.inc(operation='archive', outcome='error')
+                logger.warning("Erreur réseau lors de l'archivage (tentative %s/%s): %s",
+                               retry_count+1, self.max_retries, e)
+                await asyncio.sleep(self.retry_delay)
+            SHIORI_RETRIES.inc(operation='archive')
+            retry_count += 1
+        
+        logger.error("Échec de l'archivage après %s tentatives", self.max_retries)
+        return False
+    
+    async def _post_bookmark(self, bookmark_url, bookmark_data, headers):
+        """Envoie la requête de création sous la limite adaptative et retourne (statut, corps)."""
+        ticket = await self.limiter.acquire()
+        started = time.monotonic()
+        success = False  # Timeout et erreurs réseau comptent comme des échecs
+        try:
+            session = await self.start()
+            async with session.post(
+                bookmark_url,
+                json=bookmark_data,
+                headers=headers,
+                timeout=60  # Timeout plus long pour le téléchargement de la page
+            ) as resp:
+                status = resp.status
+                body = await resp.text()
+            # Un token expiré ne dit rien de la charge du serveur
+            success = None if status in (401, 403) else status < 500
+            SHIORI_REQUESTS.inc(operation='save_bookmark', outcome=status_outcome(status))
+            return status, body
+        except asyncio.TimeoutError:
+            SHIORI_REQUESTS.inc(operation='save_bookmark', outcome='timeout')
+            raise
+        except aiohttp.ClientError:
+            SHIORI_REQUESTS.inc(operation='save_bookmark', outcome='error')
+            raise
+        except asyncio.CancelledError:
+            success = None
+            raise
+        finally:
+            latency = time.monotonic() - started
+            SHIORI_LATENCY.observe(latency, operation='save_bookmark')
+            self.limiter.release(latency, success, ticket)
+    
+    async def _save_bookmark(self, url, description="", tags=None, create_archive=True, title=None):
+        """Envoie une URL à l'API Shiori, avec tentatives en cas d'erreur.
+
+        Retourne le bookmark créé (dictionnaire) ou None en cas d'échec.
+        """
         retry_count = 0
         
         while retry_count < self.max_retries:
             try:
                 # S'assurer qu'on a un token valide
-                await self.authenticate()
+                token = await self.authenticate()
                 
                 # Préparation des données
                 bookmark_data = {
                     "url": url,
-                    "createArchive": True
+                    "createArchive": create_archive
                 }
                 
                 if description:
@@ -104,57 +463,63 @@ class ShioriService:
                     bookmark_data["tags"] = []
                     bookmark_data["excerpt"] = description
                 
+                if tags:
+                    bookmark_data["tags"] = [{"name": tag} for tag in tags]
+                
+                if title:
+                    bookmark_data["title"] = title
+                
                 bookmark_url = f"{self.api_endpoint}/api/bookmarks"
-                headers = {"Authorization": f"Bearer {self.token}"}
+                headers = {"Authorization": f"Bearer {token}"}
                 
-                logger.info(f"Tentative d'enregistrement d'URL: {url}")
+                logger.debug("Tentative d'enregistrement d'URL: %s", url)
                 
-                async with aiohttp.ClientSession() as session:
-                    resp = await session.post(
-                        bookmark_url,
-                        json=bookmark_data,
-                        headers=headers,
-                        timeout=60  # Timeout plus long pour le téléchargement de la page
-                    )
-                    
-                    status = resp.status
-                    
-                    # Si le token est invalide, on force une nouvelle authentification
-                    if status in (401, 403):
-                        logger.info("Token expiré, nouvelle authentification...")
-                        await self.authenticate(force=True)
-                        retry_count += 1
-                        continue
-                    
-                    # Pour les erreurs 5xx, on retente
-                    if 500 <= status < 600:
-                        logger.warning(f"Erreur serveur {status}, nouvelle tentative {retry_count+1}/{self.max_retries}")
-                        retry_count += 1
-                        await asyncio.sleep(self.retry_delay)
-                        continue
-                    
-                    body = await resp.text()
-                    
-                    # Succès
-                    if 200 <= status < 300:
-                        logger.info(f"URL enregistrée dans Shiori avec succès: {url}")
-                        return True
-                    
-                    # Autres erreurs
-                    logger.error(f"Échec de l'enregistrement: {status} - {body[:200]}")
-                    return False
+                status, body = await self._post_bookmark(bookmark_url, bookmark_data, headers)
+                
+                # Si le token est invalide, on force une nouvelle authentification
+                if status in (401, 403):
+                    logger.info("Token expiré, nouvelle authentification...")
+                    await self.authenticate(force=True, stale_token=token)
+                    SHIORI_RETRIES.inc(operation='save_bookmark')
+                    retry_count += 1
+                    continue
+                
+                # Pour les erreurs 5xx, on retente
+                if 500 <= status < 600:
+                    logger.warning("Erreur serveur %s, nouvelle tentative %s/%s",
+                                   status, retry_count+1, self.max_retries)
+                    SHIORI_RETRIES.inc(operation='save_bookmark')
+                    retry_count += 1
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+                
+                # Succès
+                if 200 <= status < 300:
+                    logger.info("URL enregistrée dans Shiori avec succès: %s", url)
+                    try:
+                        bookmark = json.loads(body)
+                    except ValueError:
+                        bookmark = None
+                    return bookmark if isinstance(bookmark, dict) else {}
+                
+                # Autres erreurs
+                logger.error("Échec de l'enregistrement: %s - %s", status, body[:200])
+                return None
                     
             except asyncio.TimeoutError:
-                logger.warning(f"Timeout lors de l'enregistrement (tentative {retry_count+1}/{self.max_retries})")
+                logger.warning("Timeout lors de l'enregistrement (tentative %s/%s)", retry_count+1, self.max_retries)
+                SHIORI_RETRIES.inc(operation='save_bookmark')
                 retry_count += 1
                 await asyncio.sleep(self.retry_delay)
             except aiohttp.ClientError as e:
-                logger.warning(f"Erreur réseau lors de l'enregistrement (tentative {retry_count+1}/{self.max_retries}): {str(e)}")
+                logger.warning("Erreur réseau lors de l'enregistrement (tentative %s/%s): %s",
+                               retry_count+1, self.max_retries, e)
+                SHIORI_RETRIES.inc(operation='save_bookmark')
                 retry_count += 1
                 await asyncio.sleep(self.retry_delay)
             except Exception as e:
-                logger.error(f"Erreur inattendue lors de l'enregistrement: {str(e)}")
-                return False
+                logger.error("Erreur inattendue lors de l'enregistrement: %s", e)
+                return None
                 
-        logger.error(f"Échec de l'enregistrement après {self.max_retries} tentatives: {url}")
-        return False
+        logger.error("Échec de l'enregistrement après %s tentatives: %s", self.max_retries, url)
+        return None
@@ -0,0 +1,60 @@
+import re
+
+# Motif compilé une seule fois: une URL s'arrête aux espaces, aux chevrons
+# (syntaxe <url> de Discord), aux backticks et aux guillemets.
+URL_PATTERN = re.compile(r'https?://[^\s<>`"]+', re.IGNORECASE)
+
+# Caractères de ponctuation ou de mise en forme Markdown retirés en fin d'URL
+TRAILING_CHARS = '.,;:!?\'*_~|'
+CLOSING_PAIRS = {')': '(', ']': '[', '}': '{'}
+STRIPPABLE_CHARS = frozenset(TRAILING_CHARS) | frozenset(CLOSING_PAIRS)
+
+
+def clean_url(url):
+    """Retire la ponctuation finale et les parenthèses/crochets non appariés.
+
+    Une parenthèse fermante n'est conservée que si elle est équilibrée dans
+    l'URL (ex: https://fr.wikipedia.org/wiki/Shiori_(logiciel)), ce qui
+    permet de gérer les liens Markdown [texte](https://...).
+    """
+    while url and url[-1] in STRIPPABLE_CHARS:
+        last = url[-1]
+        if last in TRAILING_CHARS:
+            url = url[:-1]
+        elif last in CLOSING_PAIRS and url.count(CLOSING_PAIRS[last]) < url.count(last):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def _is_valid(url):
+    # Il doit rester un hôte après le schéma (http:// ou https://)
+    host = url[8:9] if url[4] in 'sS' else url[7:8]
+    return host.isalnum() or host == '['
+
+
+def extract_urls(text, extra_urls=()):
+    """Extrait les URLs d'un texte, sans doublons et dans l'ordre d'apparition.
+
+    `extra_urls` permet d'ajouter des URLs provenant d'ailleurs (embeds).
+    """
+    urls = []
+    seen = set()
+    # Raccourci: la plupart des messages ne contiennent aucune URL
+    if text and '://' in text:
+        for match in URL_PATTERN.findall(text):
+            url = clean_url(match)
+            if url not in seen and _is_valid(url):
+                seen.add(url)
+                urls.append(url)
+    for url in extra_urls:
+        if url and url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+def extract_message_urls(message):
+    """Extrait les URLs d'un message Discord (contenu et embeds)."""
+    return extract_urls(message.content, [embed.url for embed in message.embeds if embed.url])